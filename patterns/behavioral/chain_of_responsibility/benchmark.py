@@ -0,0 +1,187 @@
+"""Benchmarks the Sanitizer chain across corpora of controlled shape.
+
+Each corpus is generated from a seed, so runs are reproducible across releases.
+Every mode sanitizes the same corpus and reports throughput and, unless it
+sanitizes the corpus as a whole, per-call latency.
+
+Example Usage:
+  python -m patterns.behavioral.chain_of_responsibility.benchmark \\
+      --size 1024 --count 2000 --density 0.05 --script-rate 0.01 > results.json
+"""
+from __future__ import annotations
+import argparse
+from dataclasses import asdict, dataclass
+import json
+import random
+import string
+import time
+from typing import Callable, Union
+
+from patterns.behavioral.chain_of_responsibility.sanitizer import JavascriptSanitizer, QuoteSanitizer, Sanitizer, TagSanitizer
+
+SPECIAL_CHARACTERS = "'\"<>"
+SCRIPT_TAGS = ("<script>", "</script>")
+
+
+@dataclass
+class CorpusShape:
+  """Controls the inputs a corpus is made of."""
+  size: int = 1024
+  count: int = 1000
+  density: float = 0.02
+  script_rate: float = 0.0
+  seed: int = 0
+
+
+@dataclass
+class Result:
+  """Measurements of a single mode over a single corpus.
+
+  Latencies are None for modes that only time the whole corpus.
+  """
+  mode: str
+  shape: CorpusShape
+  calls: int
+  seconds: float
+  megabytes_per_second: float
+  p50_microseconds: float | None
+  p99_microseconds: float | None
+
+
+def generate_corpus(shape: CorpusShape) -> list[str]:
+  """Generates count inputs of size characters each.
+
+  Each character is special with probability density.
+  Each position starts a script tag with probability script_rate.
+  """
+  rng = random.Random(shape.seed)
+  plain_characters = string.ascii_letters + string.digits + " "
+  corpus = []
+  for _ in range(shape.count):
+    pieces: list[str] = []
+    length = 0
+    while length < shape.size:
+      roll = rng.random()
+      if roll < shape.script_rate:
+        piece = rng.choice(SCRIPT_TAGS)
+      elif roll < shape.script_rate + shape.density:
+        piece = rng.choice(SPECIAL_CHARACTERS)
+      else:
+        piece = rng.choice(plain_characters)
+      pieces.append(piece)
+      length += len(piece)
+    corpus.append("".join(pieces)[:shape.size])
+
+  return corpus
+
+
+def classic_chain() -> Sanitizer:
+  """Returns the chain from the sanitizer module's example."""
+  quote_sanitizer = QuoteSanitizer()
+  tag_sanitizer = TagSanitizer()
+  quote_sanitizer.next_sanitizer(tag_sanitizer)
+  tag_sanitizer.next_sanitizer(JavascriptSanitizer())
+  return quote_sanitizer
+
+
+Timings = tuple[float, Union[list[float], None]]
+
+
+def modes() -> dict[str, Callable[[list[str]], Timings]]:
+  """Returns a timing function per mode.
+
+  Each returns the total seconds and, if measured, the per-call seconds.
+  """
+  compiled_chain = classic_chain().compile()
+  cached_chain = classic_chain()
+  cached_chain.enable_cache(maxsize=4096)
+
+  def time_calls(
+      sanitize: Callable[[str], object]) -> Callable[[list[str]], Timings]:
+
+    def run(corpus: list[str]) -> Timings:
+      timings = []
+      for text_input in corpus:
+        start = time.perf_counter()
+        sanitize(text_input)
+        timings.append(time.perf_counter() - start)
+      return sum(timings), timings
+
+    return run
+
+  def sanitize_into(text_input: str):
+    compiled_chain.sanitize_into(text_input.encode(), bytearray())
+
+  def run_many(corpus: list[str]) -> Timings:
+    """Results stream back in batches, so only the total is meaningful."""
+    start = time.perf_counter()
+    for _ in classic_chain().sanitize_many(corpus, workers=None):
+      pass
+    return time.perf_counter() - start, None
+
+  return {
+      "classic": time_calls(classic_chain().sanitize),
+      "compiled": time_calls(compiled_chain.sanitize),
+      "cached": time_calls(cached_chain.sanitize),
+      "bytes": time_calls(sanitize_into),
+      "many": run_many,
+  }
+
+
+def percentile(timings: list[float], fraction: float) -> float:
+  """Returns the nearest-rank percentile of timings."""
+  ordered = sorted(timings)
+  index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+  return ordered[index]
+
+
+def benchmark(shape: CorpusShape,
+              mode_names: list[str] | None = None) -> list[Result]:
+  """Runs each mode over a corpus of the given shape."""
+  corpus = generate_corpus(shape)
+  megabytes = sum(len(text_input.encode()) for text_input in corpus) / 1e6
+  results = []
+  for mode, run in modes().items():
+    if mode_names and mode not in mode_names:
+      continue
+
+    seconds, timings = run(corpus)
+    p50 = p99 = None
+    if timings:
+      p50 = percentile(timings, 0.50) * 1e6
+      p99 = percentile(timings, 0.99) * 1e6
+    results.append(
+        Result(
+            mode=mode,
+            shape=shape,
+            calls=len(corpus),
+            seconds=seconds,
+            megabytes_per_second=megabytes / seconds if seconds else 0.0,
+            p50_microseconds=p50,
+            p99_microseconds=p99,
+        ))
+
+  return results
+
+
+def main(argv: list[str] | None = None):
+  """Prints benchmark results as JSON."""
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--size", type=int, default=CorpusShape.size)
+  parser.add_argument("--count", type=int, default=CorpusShape.count)
+  parser.add_argument("--density", type=float, default=CorpusShape.density)
+  parser.add_argument("--script-rate",
+                      type=float,
+                      default=CorpusShape.script_rate)
+  parser.add_argument("--seed", type=int, default=CorpusShape.seed)
+  parser.add_argument("--mode", action="append", dest="modes")
+  args = parser.parse_args(argv)
+
+  shape = CorpusShape(args.size, args.count, args.density, args.script_rate,
+                      args.seed)
+  results = benchmark(shape, args.modes)
+  print(json.dumps([asdict(result) for result in results], indent=2))
+
+
+if __name__ == "__main__":
+  main()
@@ -14,52 +14,709 @@ Example Usage:
 
   print(sanitized_input)
 
+  # The chain can also be compiled into as few passes over the input as
+  # possible.
+  compiled_chain = quote_sanitizer.compile()
+  assert compiled_chain.sanitize(text_input) == sanitized_input
+
+  # Large inputs can be sanitized chunk by chunk as they arrive.
+  for chunk in quote_sanitizer.sanitize_stream(request.iter_chunks()):
+    response.write(chunk)
+
+  # Bytes from the network can be sanitized straight into an output buffer.
+  output_buffer = bytearray()
+  compiled_chain.sanitize_into(memoryview(request_body), output_buffer)
+
+  # Repeated inputs such as usernames can be served from an LRU cache.
+  quote_sanitizer.enable_cache(maxsize=4096)
+  print(quote_sanitizer.cache_info())
+
+  # Each link can record how long it takes and how often it changes anything.
+  quote_sanitizer.enable_instrumentation()
+  quote_sanitizer.sanitize(text_input)
+  print(quote_sanitizer.stats_snapshot())
+
+  # Event loop servers can await sanitization, offloading large inputs.
+  sanitized_input = await quote_sanitizer.sanitize_async(text_input)
+
+  # Large batches of inputs can be fanned out to a pool of worker processes.
+  for sanitized_comment in quote_sanitizer.sanitize_many(comments, workers=8):
+    store(sanitized_comment)
+
 
 Disclaimer: This module is for educational purposes only!
 Do not use the following code to sanitize input in production.
 """
 from __future__ import annotations
-from abc import ABC, abstractmethod
+from abc import ABC
+import asyncio
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+import codecs
+import functools
+import graphlib
+import itertools
+import os
+import re
+import time
+import weakref
+from typing import Any, AnyStr, Callable, Union
+
+Buffer = Union[bytes, bytearray, memoryview]
 
 
 class Sanitizer(ABC):
-  """Sanitizer that prevents malicious code injection by users."""
+  """Sanitizer that prevents malicious code injection by users.
+
+  Each Sanitizer declares the replacements it performs, in order.
+  Sanitizers with custom logic may override escape() instead.
+  Sanitizers that override sanitize(), as in the original API, are opaque:
+  they always run and pass their output on themselves. Calling
+  Sanitizer.sanitize() from such an override escapes and forwards as usual.
+
+  A Sanitizer may also declare the trigger characters it reacts to.
+  When no link in the chain is triggered, the input is returned untouched.
+  """
   next: Sanitizer | None = None
+  replacements: tuple[tuple[str, str], ...] = ()
+  triggers: frozenset[str] | None = None
+  stats: LinkStats | None = None
+  async_sanitizer: AsyncSanitizer | None = None
+  _cache: Callable[[str], str] | None = None
 
   def next_sanitizer(self, sanitizer: Sanitizer):
     """Sets the next Sanitizer class in the Chain of Responsibility."""
     self.next = sanitizer
+    self.cache_clear()
 
-  @abstractmethod
   def sanitize(self, text_input: str) -> str:
-    """Abstract sanitization method that renders potentially malicious code harmless."""
+    """Renders potentially malicious code harmless using the whole chain.
 
+    Returns the input untouched if it contains no link's trigger characters.
+    """
+    if self.opaque():
+      # Only reachable through super() from an override of sanitize().
+      return self.forward(text_input)
 
-class QuoteSanitizer(Sanitizer):
-  """Sanitizes quotes to prevent closing attributes prematurely and injecting code."""
+    if self._cache:
+      return self._cache(text_input)
 
-  def sanitize(self, text_input: str) -> str:
-    """Replaces quotes with character identity objects."""
-    text_input = text_input.replace("\'", "&quot;").replace("\"", "&quot;")
+    return self._sanitize(text_input)
 
-    return self.next.sanitize(text_input) if self.next else text_input
+  def _sanitize(self, text_input: str) -> str:
+    """Skips the chain when no link could change the input."""
+    for link in self.chain():
+      triggers = link.trigger_chars()
+      if triggers is None or any(char in text_input for char in triggers):
+        return self.handle(text_input)
 
+    return text_input
 
-class TagSanitizer(Sanitizer):
-  """Sanitizes input to prevent creating HTML tags with open and close brackets."""
+  def handle(self, text_input: str) -> str:
+    """Escapes the input, then passes it to the next Sanitizer, if any."""
+    if self.opaque():
+      return self.sanitize(text_input)
 
-  def sanitize(self, text_input: str) -> str:
-    """Replaces HTML open and close brackets with character identity objects."""
-    text_input = text_input.replace("<", "&lt;").replace(">", "&gt;")
+    return self.forward(text_input)
+
+  def forward(self, text_input: str) -> str:
+    """Escapes the input, then hands it to the next Sanitizer, if any."""
+    if self.stats:
+      text_input = self.stats.measure(self.escape, text_input)
+    else:
+      text_input = self.escape(text_input)
+
+    return self.next.handle(text_input) if self.next else text_input
+
+  def enable_instrumentation(self):
+    """Starts recording LinkStats for this Sanitizer and every one after it."""
+    for link in self.chain():
+      link.stats = LinkStats()
+
+  def disable_instrumentation(self):
+    """Stops recording LinkStats for this Sanitizer and every one after it."""
+    for link in self.chain():
+      link.stats = None
+
+  def stats_snapshot(self) -> dict[str, dict[str, float]]:
+    """Returns each instrumented link's stats, keyed by position and class."""
+    return {
+        f"{index}:{type(link).__name__}": link.stats.snapshot()
+        for index, link in enumerate(self.chain())
+        if link.stats
+    }
+
+  def trigger_chars(self) -> frozenset[str] | None:
+    """Characters without which this Sanitizer never changes its input.
+
+    Derived from the replacements unless declared. None means always run.
+    Declared triggers are ignored by subclasses that change replacements or
+    escape() without declaring them again.
+    """
+    if self.opaque():
+      return None
+
+    if self.triggers is not None and _defined_at(self, "triggers") <= min(
+        _defined_at(self, "replacements"), _defined_at(self, "escape")):
+      return self.triggers
+
+    if type(self).escape is not Sanitizer.escape or not all(
+        old for old, _ in self.replacements):
+      return None
+
+    return frozenset(old[0] for old, _ in self.replacements)
+
+  async def sanitize_async(self, text_input: str) -> str:
+    """Sanitizes without blocking the event loop on large inputs.
+
+    Uses this chain head's AsyncSanitizer, creating a default one if needed.
+    """
+    if not self.async_sanitizer:
+      self.async_sanitizer = AsyncSanitizer(self)
+
+    return await self.async_sanitizer.sanitize(text_input)
+
+  def enable_cache(self, maxsize: int = 1024):
+    """Memoizes sanitize() on this chain head in an LRU cache of maxsize."""
+    self._cache = functools.lru_cache(maxsize)(self._sanitize)
+
+  def disable_cache(self):
+    """Stops memoizing sanitize()."""
+    self._cache = None
+
+  def cache_info(self) -> Any:
+    """Returns the cache's hits, misses, maxsize and currsize, if enabled."""
+    return self._cache.cache_info() if self._cache else None    # type: ignore
+
+  def cache_clear(self):
+    """Empties the cache, e.g. after changing links further down the chain."""
+    if self._cache:
+      self._cache.cache_clear()    # type: ignore
+
+  def __getstate__(self) -> dict[str, Any]:
+    """Leaves the cache behind when shipped to worker processes."""
+    state = self.__dict__.copy()
+    state.pop("_cache", None)
+    state.pop("async_sanitizer", None)
+    return state
+
+  def escape(self, text_input: str) -> str:
+    """Applies this Sanitizer's replacements without passing the result on."""
+    for old, new in self.replacements:
+      text_input = text_input.replace(old, new)
+
+    return text_input
+
+  def opaque(self) -> bool:
+    """Whether this Sanitizer overrides sanitize() and forwards on its own."""
+    return type(self).sanitize is not Sanitizer.sanitize
 
-    return self.next.sanitize(text_input) if self.next else text_input
+  def chain(self) -> Iterator[Sanitizer]:
+    """Yields this Sanitizer followed by every Sanitizer after it."""
+    sanitizer: Sanitizer | None = self
+    while sanitizer:
+      yield sanitizer
+      sanitizer = sanitizer.next
+
+  def compile(self) -> CompiledChain:
+    """Fuses this Sanitizer and the rest of the chain into a CompiledChain."""
+    return CompiledChain.from_chain(self)
+
+  def sanitize_stream(self,
+                      chunks: Iterable[AnyStr],
+                      encoding: str = "utf-8") -> Iterator[AnyStr]:
+    """Sanitizes an iterable of str or bytes chunks, yielding sanitized ones."""
+    return self.compile().sanitize_stream(chunks, encoding)
+
+  def sanitize_into(self, data: Buffer, out: bytearray) -> int:
+    """Sanitizes UTF-8 data, appending it to out. Returns the bytes written."""
+    return self.compile().sanitize_into(data, out)
+
+  def sanitize_many(self,
+                    texts: Iterable[str],
+                    workers: int | None = None,
+                    chunksize: int = 1024) -> Iterator[str]:
+    """Sanitizes many inputs across worker processes, yielding them in order."""
+    return self.compile().sanitize_many(texts, workers, chunksize)
+
+
+@dataclass
+class LinkStats:
+  """Cumulative measurements of a single link in a Sanitizer chain.
+
+  Sizes are measured in characters, since links operate on str.
+  """
+  calls: int = 0
+  seconds: float = 0.0
+  chars_in: int = 0
+  chars_out: int = 0
+  modified: int = 0
+
+  def measure(self, escape: Callable[[str], str], text_input: str) -> str:
+    """Times a single escape call and records its effect on the input."""
+    start = time.perf_counter()
+    text_output = escape(text_input)
+    self.seconds += time.perf_counter() - start
+    self.calls += 1
+    self.chars_in += len(text_input)
+    self.chars_out += len(text_output)
+    self.modified += text_output != text_input
+    return text_output
+
+  def snapshot(self) -> dict[str, float]:
+    """Returns a copy of the measurements as a dict."""
+    return dict(self.__dict__)
+
+
+class QuoteSanitizer(Sanitizer):
+  """Sanitizes quotes to prevent closing attributes prematurely and injecting code."""
+  # Replaces quotes with character identity objects.
+  replacements = (("\'", "&quot;"), ("\"", "&quot;"))
+
+
+class TagSanitizer(Sanitizer):
+  """Sanitizes input to prevent creating HTML tags with open and close brackets."""
+  # Replaces HTML open and close brackets with character identity objects.
+  replacements = (("<", "&lt;"), (">", "&gt;"))
 
 
 class JavascriptSanitizer(Sanitizer):
   """Sanitizes input to prevent running malicious Javascript code."""
+  # Removes Javascript tags.
+  replacements = (("<script>", ""), ("</script>", ""))
+
+
+@dataclass
+class TranslateStage:
+  """Replaces any number of single characters as if in a single pass.
+
+  str.replace is much faster than str.translate with multi-character values,
+  so the characters are replaced one after another whenever some order
+  gives the same result, i.e. no replacement produces a character that is
+  replaced after it. Otherwise, str.translate is used.
+  """
+  mapping: dict[str, str]
+  table: dict[int, str] = field(init=False, repr=False)
+
+  def __post_init__(self):
+    self.table = str.maketrans(self.mapping)
+
+  def __call__(self, text_input: str) -> str:
+    if self.order is None:
+      return text_input.translate(self.table)
+
+    for old, new in self.order:
+      text_input = text_input.replace(old, new)
+
+    return text_input
+
+  @functools.cached_property
+  def order(self) -> list[tuple[str, str]] | None:
+    """Replacements in an order equivalent to translating, if there is one."""
+    sorter: graphlib.TopologicalSorter[str] = graphlib.TopologicalSorter()
+    for char, value in self.mapping.items():
+      if char != value:
+        sorter.add(
+            char,
+            *(other for other in self.mapping
+              if other != char and other in value))
+    try:
+      return [(char, self.mapping[char]) for char in sorter.static_order()]
+    except graphlib.CycleError:
+      return None
+
+  @functools.cached_property
+  def byte_pattern(self) -> re.Pattern[bytes]:
+    return re.compile(b"|".join(
+        re.escape(char.encode()) for char in self.mapping))
+
+  @functools.cached_property
+  def byte_order(self) -> list[tuple[bytes, bytes]]:
+    return [(old.encode(), new.encode()) for old, new in self.order or ()]
+
+  @functools.cached_property
+  def byte_mapping(self) -> dict[bytes, bytes]:
+    return {
+        char.encode(): value.encode() for char, value in self.mapping.items()
+    }
+
+  def write(self, data: Buffer, out: bytearray):
+    """Appends the translated UTF-8 data to out.
+
+    Memoryviews are scanned in place rather than copied to bytes first.
+    """
+    if self.order is None or isinstance(data, memoryview):
+      _substitute(self.byte_pattern, data, out, self.byte_mapping.__getitem__)
+    else:
+      _replace_into(self.byte_order, data, out)
+
+  def stream(self, chunks: Iterable[str]) -> Iterator[str]:
+    """Single characters never straddle chunks, so each chunk stands alone."""
+    for chunk in chunks:
+      yield self(chunk)
+
+  def then(self, old: str, new: str) -> TranslateStage:
+    """Returns a stage equivalent to this one, then replacing one character."""
+    mapping = {
+        char: value.replace(old, new) for char, value in self.mapping.items()
+    }
+    mapping.setdefault(old, new)
+    return TranslateStage(mapping)
+
+  def excludes(self, text: str) -> bool:
+    """Whether text can never occur in the output of this stage."""
+    return any(
+        char in self.mapping and not any(char in value
+                                         for value in self.mapping.values())
+        for char in text)
+
+
+@dataclass
+class ReplaceStage:
+  """Replaces every occurrence of a substring."""
+  old: str
+  new: str
+
+  def __call__(self, text_input: str) -> str:
+    return text_input.replace(self.old, self.new)
+
+  @functools.cached_property
+  def byte_pattern(self) -> re.Pattern[bytes]:
+    return re.compile(re.escape(self.old.encode()))
+
+  def write(self, data: Buffer, out: bytearray):
+    """Appends the UTF-8 data to out with every occurrence replaced.
+
+    Memoryviews are scanned in place rather than copied to bytes first.
+    """
+    if not self.old:
+      out += self(bytes(data).decode()).encode()
+    elif isinstance(data, memoryview):
+      new = self.new.encode()
+      _substitute(self.byte_pattern, data, out, lambda _: new)
+    else:
+      _replace_into([(self.old.encode(), self.new.encode())], data, out)
+
+  def stream(self, chunks: Iterable[str]) -> Iterator[str]:
+    """Holds back just enough of each chunk to catch matches split across it.
+
+    Everything up to the cut point is replaced exactly as str.replace would,
+    since no match found scanning left to right from the start spans the cut.
+    """
+    if not self.old:
+      yield self("".join(chunks))
+      return
+
+    tail = ""
+    for chunk in chunks:
+      text = tail + chunk
+      cut = len(text) - len(self.old) + 1
+      end = 0
+      start = text.find(self.old)
+      while start != -1 and start < cut:
+        end = start + len(self.old)
+        start = text.find(self.old, end)
+
+      cut = max(cut, end, 0)
+      yield text[:cut].replace(self.old, self.new)
+      tail = text[cut:]
+
+    yield tail
+
+
+@dataclass
+class EscapeStage:
+  """Runs a Sanitizer's custom escape method."""
+  sanitizer: Sanitizer
+
+  def __call__(self, text_input: str) -> str:
+    return self.sanitizer.escape(text_input)
+
+  def write(self, data: Buffer, out: bytearray):
+    """Custom escape logic only works on str, so the data is decoded."""
+    out += self(bytes(data).decode()).encode()
+
+  def stream(self, chunks: Iterable[str]) -> Iterator[str]:
+    """Custom escape logic is opaque, so the whole input is buffered."""
+    yield self("".join(chunks))
+
+
+@dataclass
+class SanitizeStage(EscapeStage):
+  """Runs an opaque Sanitizer's sanitize method and the rest of its chain.
+
+  The Sanitizer stays linked, as it may post-process or drop what follows.
+  """
+
+  def __call__(self, text_input: str) -> str:
+    return self.sanitizer.sanitize(text_input)
+
+
+Stage = Union[TranslateStage, ReplaceStage, EscapeStage]
+
+
+@dataclass
+class CompiledChain:
+  """A Sanitizer chain reduced to the fewest stages that give identical output.
+
+  Consecutive single character replacements collapse into one TranslateStage.
+  Replacements that an earlier stage makes impossible are dropped entirely,
+  e.g. "<script>" can never be found once "<" has been escaped.
+  Fusing stops at the first link that overrides sanitize(), which becomes
+  the last stage.
+
+  Inputs without any of the chain's trigger characters skip every stage.
+  """
+  stages: list[Stage] = field(default_factory=list)
+  triggers: frozenset[str] | None = frozenset()
+
+  @classmethod
+  def from_chain(cls, sanitizer: Sanitizer) -> CompiledChain:
+    """Walks the chain once and folds every replacement into stages."""
+    compiled_chain = cls()
+    for link in sanitizer.chain():
+      triggers = link.trigger_chars()
+      if triggers is None or compiled_chain.triggers is None:
+        compiled_chain.triggers = None
+      else:
+        compiled_chain.triggers |= triggers
+
+      if link.opaque():
+        compiled_chain.stages.append(SanitizeStage(link))
+        break
+
+      if type(link).escape is not Sanitizer.escape:
+        compiled_chain.stages.append(EscapeStage(link))
+        continue
+
+      for old, new in link.replacements:
+        compiled_chain.add(old, new)
+
+    return compiled_chain
+
+  def add(self, old: str, new: str):
+    """Appends a replacement, fusing it with the last stage where possible."""
+    if old == new:
+      return
+
+    last_stage = self.stages[-1] if self.stages else None
+
+    if len(old) == 1:
+      if isinstance(last_stage, TranslateStage):
+        self.stages[-1] = last_stage.then(old, new)
+      else:
+        self.stages.append(TranslateStage({old: new}))
+
+    elif isinstance(last_stage, TranslateStage) and last_stage.excludes(old):
+      return
+
+    else:
+      self.stages.append(ReplaceStage(old, new))
 
   def sanitize(self, text_input: str) -> str:
-    """Removes Javascript tags."""
-    text_input = text_input.replace("<script>", "").replace("</script>", "")
+    """Runs every stage over the input."""
+    if self.triggers is not None and not any(char in text_input
+                                             for char in self.triggers):
+      return text_input
+
+    for stage in self.stages:
+      text_input = stage(text_input)
+
+    return text_input
+
+  @functools.cached_property
+  def byte_triggers(self) -> list[bytes]:
+    return [char.encode() for char in self.triggers or ()]
+
+  @functools.cached_property
+  def trigger_pattern(self) -> re.Pattern[bytes]:
+    return re.compile(b"|".join(map(re.escape, self.byte_triggers)))
+
+  def triggered(self, data: Buffer) -> bool:
+    """Whether any link could change the UTF-8 data."""
+    if self.triggers is None:
+      return True
+    if isinstance(data, memoryview):
+      return bool(self.byte_triggers and self.trigger_pattern.search(data))
+    return any(char in data for char in self.byte_triggers)
+
+  def sanitize_into(self, data: Buffer, out: bytearray) -> int:
+    """Sanitizes UTF-8 data, appending the result to out. Returns bytes written.
+
+    Every stage works on the bytes directly without decoding them.
+    UTF-8 patterns cannot match inside another multi-byte UTF-8 character,
+    so the output equals sanitize(data.decode()).encode().
+    Only custom escape() links decode.
+    """
+    start = len(out)
+    if not self.triggered(data):
+      out += data
+      return len(out) - start
+
+    for index, stage in enumerate(self.stages):
+      if index == len(self.stages) - 1:
+        stage.write(data, out)
+      else:
+        buffer = bytearray()
+        stage.write(data, buffer)
+        data = buffer
+
+    if not self.stages:
+      out += data
+
+    return len(out) - start
+
+  def sanitize_stream(self,
+                      chunks: Iterable[AnyStr],
+                      encoding: str = "utf-8") -> Iterator[AnyStr]:
+    """Sanitizes an iterable of str or bytes chunks, yielding sanitized chunks.
+
+    Each stage only carries over the tail that could still begin a match,
+    so memory is bounded by the chunk size rather than the payload size.
+    Bytes chunks are decoded incrementally, so multi-byte characters may
+    also be split across chunks.
+    """
+    chunks = iter(chunks)
+    first_chunk = next(chunks, None)
+    if first_chunk is None:
+      return
+
+    chunks = itertools.chain([first_chunk], chunks)
+    if isinstance(first_chunk, str):
+      texts = chunks
+    else:
+      texts = self._decode(chunks, encoding)
+
+    for stage in self.stages:
+      texts = stage.stream(texts)
+
+    for text in texts:
+      if text:
+        yield text if isinstance(first_chunk, str) else text.encode(encoding)
+
+  @staticmethod
+  def _decode(chunks: Iterable[bytes], encoding: str) -> Iterator[str]:
+    """Decodes chunks without breaking characters split across them."""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for chunk in chunks:
+      yield decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
+
+  def sanitize_many(self,
+                    texts: Iterable[str],
+                    workers: int | None = None,
+                    chunksize: int = 1024) -> Iterator[str]:
+    """Sanitizes many inputs across worker processes, yielding results in order.
+
+    The compiled chain is shipped to each worker once when it starts.
+    Inputs are sent in batches of chunksize, and only a few batches per worker
+    are in flight at a time, so arbitrarily long iterables are streamed.
+    With a single worker, inputs are sanitized in this process instead.
+    """
+    workers = workers or os.cpu_count() or 1
+    batches = _batched(texts, chunksize)
+
+    if workers == 1:
+      for batch in batches:
+        yield from map(self.sanitize, batch)
+      return
+
+    with ProcessPoolExecutor(workers,
+                             initializer=_init_worker,
+                             initargs=(self,)) as executor:
+      pending: deque[Future[list[str]]] = deque()
+      for batch in batches:
+        pending.append(executor.submit(_sanitize_batch, batch))
+        if len(pending) >= 2 * workers:
+          yield from pending.popleft().result()
+
+      while pending:
+        yield from pending.popleft().result()
+
+
+@dataclass
+class AsyncSanitizer:
+  """Sanitizes inputs from coroutines without blocking the event loop.
+
+  Inputs shorter than offload_threshold characters are sanitized inline.
+  Larger inputs run on the executor, or the event loop's default executor,
+  with at most max_concurrency of them submitted at a time per event loop.
+  """
+  sanitizer: Sanitizer | CompiledChain
+  offload_threshold: int = 64 * 1024
+  max_concurrency: int = 4
+  executor: Executor | None = None
+  semaphores: weakref.WeakKeyDictionary[Any, asyncio.Semaphore] = field(
+      default_factory=weakref.WeakKeyDictionary, init=False, repr=False)
+
+  def semaphore(self) -> asyncio.Semaphore:
+    """Returns the running event loop's semaphore, as each binds to one loop."""
+    loop = asyncio.get_running_loop()
+    if loop not in self.semaphores:
+      self.semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+    return self.semaphores[loop]
+
+  async def sanitize(self, text_input: str) -> str:
+    """Sanitizes the input inline or on the executor, depending on its size."""
+    if len(text_input) < self.offload_threshold:
+      return self.sanitizer.sanitize(text_input)
+
+    async with self.semaphore():
+      loop = asyncio.get_running_loop()
+      return await loop.run_in_executor(self.executor, self.sanitizer.sanitize,
+                                        text_input)
+
+
+def _defined_at(sanitizer: Sanitizer, name: str) -> int:
+  """The MRO position of the class defining name, or -1 for the instance."""
+  if name in vars(sanitizer):
+    return -1
+  return next(index for index, cls in enumerate(type(sanitizer).__mro__)
+              if name in vars(cls))
+
+
+def _replace_into(replacements: Iterable[tuple[bytes, bytes]],
+                  data: bytes | bytearray, out: bytearray):
+  """Appends data to out with each replacement applied in turn."""
+  for old, new in replacements:
+    data = data.replace(old, new)
+
+  out += data
+
+
+def _substitute(pattern: re.Pattern[bytes], data: Buffer, out: bytearray,
+                replacement: Callable[[bytes], bytes]):
+  """Appends data to out, replacing each match and copying the runs between."""
+  view = memoryview(data)
+  position = 0
+  for match in pattern.finditer(view):
+    start, end = match.span()
+    out += view[position:start]
+    out += replacement(match.group())
+    position = end
+
+  out += view[position:]
+
+
+def _batched(texts: Iterable[str], size: int) -> Iterator[list[str]]:
+  """Splits an iterable into lists of up to size items."""
+  texts = iter(texts)
+  while batch := list(itertools.islice(texts, size)):
+    yield batch
+
+
+_worker_chain: CompiledChain | None = None
+
+
+def _init_worker(compiled_chain: CompiledChain):
+  """Stores the compiled chain once per worker process."""
+  global _worker_chain
+  _worker_chain = compiled_chain
+
 
-    return self.next.sanitize(text_input) if self.next else text_input
+def _sanitize_batch(batch: list[str]) -> list[str]:
+  """Sanitizes a batch of inputs with the worker's compiled chain."""
+  assert _worker_chain is not None
+  return [_worker_chain.sanitize(text_input) for text_input in batch]
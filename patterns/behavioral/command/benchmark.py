@@ -0,0 +1,226 @@
+"""Benchmarks the Browser Command module.
+
+Example Usage:
+  python -m patterns.behavioral.command.benchmark keystrokes --count 1000000
+  python -m patterns.behavioral.command.benchmark trace \\
+      --length 100000 --tabs 5000
+  python -m patterns.behavioral.command.benchmark trace \\
+      --trace-file keystrokes.txt
+"""
+from __future__ import annotations
+import argparse
+from dataclasses import asdict, dataclass
+import json
+import random
+import time
+import tracemalloc
+from typing import Callable
+
+from patterns.behavioral.command.browser_commands import BrowserCommand, BrowserController, CloseTab, CycleTab, Key, KeyCombination, Modifier, NewTab, ReverseCycleTab, TabHistory, UndoCloseTab, WebBrowser
+
+HOTKEYS = {
+    "Ctrl+T": KeyCombination.of(Key.T, Modifier.CTRL),
+    "Ctrl+Tab": KeyCombination.of(Key.TAB, Modifier.CTRL),
+    "Ctrl+Shift+Tab": KeyCombination.of(Key.TAB, Modifier.CTRLSHIFT),
+    "Ctrl+W": KeyCombination.of(Key.W, Modifier.CTRL),
+    "Ctrl+Shift+T": KeyCombination.of(Key.T, Modifier.CTRLSHIFT),
+    "T": KeyCombination.of(Key.T),
+}
+
+
+class StringKeyedController(BrowserController):
+  """The controller before hotkeys were hashable, keyed by each hotkey's string.
+
+  Every lookup formats a new string from the key combination.
+  """
+  string_commands: dict[str, BrowserCommand]
+
+  def __init__(self):
+    super().__init__()
+    self.string_commands = {}
+
+  def register_hotkey(self, key_combination: KeyCombination,
+                      command: BrowserCommand):
+    name = f"{key_combination.modifier}+{key_combination.key}"
+    self.string_commands[name] = command
+
+  def send_keystrokes(self, key_combination: KeyCombination) -> str | None:
+    command = self.string_commands.get(
+        f"{key_combination.modifier}+{key_combination.key}", None)
+
+    if command:
+      return command.execute()
+
+    else:
+      return key_combination.key.value
+
+
+def keystroke_throughput(count: int = 200_000) -> dict[str, float]:
+  """Returns keystrokes per second sent through each kind of controller."""
+  hotkeys = [
+      KeyCombination.of(Key.TAB, Modifier.CTRL),
+      KeyCombination.of(Key.TAB, Modifier.CTRLSHIFT),
+      KeyCombination.of(Key.T, Modifier.ALT),
+  ]
+
+  def throughput(controller: BrowserController) -> float:
+    browser = WebBrowser(["google.com", "example.com"])
+    controller.register_hotkey(hotkeys[0], CycleTab(browser))
+    controller.register_hotkey(hotkeys[1], ReverseCycleTab(browser))
+    send_keystrokes: Callable[[KeyCombination], str | None]
+    send_keystrokes = controller.send_keystrokes
+    keystrokes = hotkeys * (count // len(hotkeys))
+
+    start = time.perf_counter()
+    for key_combination in keystrokes:
+      send_keystrokes(key_combination)
+    return len(keystrokes) / (time.perf_counter() - start)
+
+  return {
+      "before": throughput(StringKeyedController()),
+      "after": throughput(BrowserController()),
+  }
+
+
+@dataclass
+class TraceShape:
+  """Controls the keystrokes a generated trace is made of.
+
+  close_rate is the share of CloseTab and UndoCloseTab keystrokes.
+  The rest are split between opening, cycling and plain keystrokes.
+  """
+  length: int = 100_000
+  tabs: int = 1000
+  close_rate: float = 0.5
+  seed: int = 0
+
+
+@dataclass
+class TraceResult:
+  """Measurements of replaying a keystroke trace."""
+  keystrokes: int
+  initial_tabs: int
+  final_tabs: int
+  closed_tabs: int
+  ops_per_second: float
+  p50_microseconds: float
+  p99_microseconds: float
+  max_microseconds: float
+  peak_memory_bytes: int
+
+
+def generate_trace(shape: TraceShape) -> list[str]:
+  """Generates a reproducible list of hotkey names."""
+  rng = random.Random(shape.seed)
+  other_hotkeys = ["Ctrl+T", "Ctrl+Tab", "Ctrl+Shift+Tab", "T"]
+  trace = []
+  for _ in range(shape.length):
+    if rng.random() < shape.close_rate:
+      trace.append(rng.choice(["Ctrl+W", "Ctrl+W", "Ctrl+Shift+T"]))
+    else:
+      trace.append(rng.choice(other_hotkeys))
+  return trace
+
+
+def load_trace(path: str) -> list[str]:
+  """Loads a trace of hotkey names, one per line."""
+  with open(path, encoding="utf-8") as file:
+    return [line.strip() for line in file if line.strip()]
+
+
+def replay_trace(trace: list[str],
+                 initial_tabs: int = 1000,
+                 history_capacity: int | None = None) -> TraceResult:
+  """Replays a trace against a browser with initial_tabs open.
+
+  Latency is measured on one replay, and peak memory on a second replay
+  under tracemalloc, so tracing does not skew the timings.
+  """
+
+  def setup() -> tuple[BrowserController, WebBrowser, TabHistory]:
+    browser = WebBrowser([f"tab{index}.com" for index in range(initial_tabs)])
+    history = TabHistory(capacity=history_capacity)
+    controller = BrowserController()
+    shortcuts: list[tuple[str, BrowserCommand]] = [
+        ("Ctrl+T", NewTab(browser)),
+        ("Ctrl+Tab", CycleTab(browser)),
+        ("Ctrl+Shift+Tab", ReverseCycleTab(browser)),
+        ("Ctrl+W", CloseTab(browser, history)),
+        ("Ctrl+Shift+T", UndoCloseTab(browser, history)),
+    ]
+    for name, command in shortcuts:
+      controller.register_hotkey(HOTKEYS[name], command)
+    return controller, browser, history
+
+  def run(controller: BrowserController, timings: list[float] | None = None):
+    for name in trace:
+      start = time.perf_counter()
+      try:
+        controller.send_keystrokes(HOTKEYS[name])
+      except IndexError:
+        pass    # Closing a tab when none are open.
+      if timings is not None:
+        timings.append(time.perf_counter() - start)
+
+  controller, browser, history = setup()
+  timings: list[float] = []
+  run(controller, timings)
+
+  tracemalloc.start()
+  run(setup()[0])
+  _, peak_memory = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+
+  timings.sort()
+  return TraceResult(
+      keystrokes=len(trace),
+      initial_tabs=initial_tabs,
+      final_tabs=len(browser.tabs),
+      closed_tabs=len(history.history),
+      ops_per_second=len(trace) / sum(timings) if sum(timings) else 0.0,
+      p50_microseconds=percentile(timings, 0.50) * 1e6,
+      p99_microseconds=percentile(timings, 0.99) * 1e6,
+      max_microseconds=timings[-1] * 1e6 if timings else 0.0,
+      peak_memory_bytes=peak_memory,
+  )
+
+
+def percentile(ordered_timings: list[float], fraction: float) -> float:
+  """Returns the nearest-rank percentile of sorted timings."""
+  if not ordered_timings:
+    return 0.0
+  index = round(fraction * len(ordered_timings)) - 1
+  return ordered_timings[min(len(ordered_timings) - 1, max(0, index))]
+
+
+def main(argv: list[str] | None = None):
+  """Prints benchmark results as JSON."""
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  subparsers = parser.add_subparsers(dest="benchmark", required=True)
+  keystrokes = subparsers.add_parser(
+      "keystrokes", help="hotkey dispatch keystrokes per second")
+  keystrokes.add_argument("--count", type=int, default=200_000)
+  trace = subparsers.add_parser("trace", help="keystroke trace replay")
+  trace.add_argument("--length", type=int, default=TraceShape.length)
+  trace.add_argument("--tabs", type=int, default=TraceShape.tabs)
+  trace.add_argument("--close-rate", type=float, default=TraceShape.close_rate)
+  trace.add_argument("--seed", type=int, default=TraceShape.seed)
+  trace.add_argument("--trace-file", help="hotkey names, one per line")
+  trace.add_argument("--history-capacity", type=int)
+  args = parser.parse_args(argv)
+
+  if args.benchmark == "keystrokes":
+    print(json.dumps(keystroke_throughput(args.count), indent=2))
+
+  elif args.benchmark == "trace":
+    if args.trace_file:
+      keystroke_trace = load_trace(args.trace_file)
+    else:
+      keystroke_trace = generate_trace(
+          TraceShape(args.length, args.tabs, args.close_rate, args.seed))
+    result = replay_trace(keystroke_trace, args.tabs, args.history_capacity)
+    print(json.dumps(asdict(result), indent=2))
+
+
+if __name__ == "__main__":
+  main()
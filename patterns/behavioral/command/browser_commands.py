@@ -8,9 +8,16 @@ As a result, the Sender and Receiver are loosely coupled.
 
 from __future__ import annotations
 from abc import ABC, abstractmethod
+import asyncio
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator, MutableSequence
+import contextlib
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Any, Protocol
+import itertools
+import sys
+import time
+from typing import Any, ClassVar, Protocol, overload
 
 
 class Key(str, Enum):
@@ -29,15 +36,37 @@ class Modifier(str, Enum):
   CTRLSHIFT = "Ctrl+Shift+"
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class KeyCombination:
-  """Key combinations."""
+  """Key combinations.
+
+  Immutable and hashable, with the hash computed once, so a lookup in the
+  BrowserController's commands allocates nothing. KeyCombination.of()
+  returns a single shared instance per combination.
+  """
   key: Key
   modifier: Modifier | str = field(default_factory=str)
+  value: str = field(init=False, repr=False)
+  _hash: int = field(init=False, repr=False)
+  _interned: ClassVar[dict[KeyCombination, KeyCombination]] = {}
 
-  @property
-  def value(self) -> str:
-    return f"{self.modifier}+{self.key}"
+  def __post_init__(self):
+    object.__setattr__(self, "value", f"{self.modifier}+{self.key}")
+    object.__setattr__(self, "_hash", hash(self.value))
+
+  def __hash__(self) -> int:
+    return self._hash
+
+  def __eq__(self, other: object) -> bool:
+    if not isinstance(other, KeyCombination):
+      return NotImplemented
+    return self is other or self.value == other.value
+
+  @classmethod
+  def of(cls, key: Key, modifier: Modifier | str = "") -> KeyCombination:
+    """Returns the shared instance of a key combination."""
+    key_combination = cls(key, modifier)
+    return cls._interned.setdefault(key_combination, key_combination)
 
 
 class Command(Protocol):
@@ -49,7 +78,7 @@ class Command(Protocol):
 
 class BrowserController:
   """Controls the browser with commands."""
-  commands: dict[str, BrowserCommand]
+  commands: dict[KeyCombination, BrowserCommand]
 
   def __init__(self):
     self.commands = {}
@@ -57,12 +86,13 @@ class BrowserController:
   def register_hotkey(self, key_combination: KeyCombination,
                       command: BrowserCommand):
     """Associates a hotkey to a command."""
-    self.commands[key_combination.value] = command
+    self.commands[KeyCombination.of(key_combination.key,
+                                    key_combination.modifier)] = command
 
   def send_keystrokes(self, key_combination: KeyCombination) -> str | None:
     """Searches for the keystroke in commands, then executes the command, if any.
     Otherwise, returns the key pressed."""
-    command = self.commands.get(key_combination.value, None)
+    command = self.commands.get(key_combination, None)
 
     if command:
       return command.execute()
@@ -71,15 +101,313 @@ class BrowserController:
       return key_combination.key.value
 
 
+class TabList(MutableSequence[str]):
+  """Tabs in the order they were opened, indexed and removed in O(log n).
+
+  Closing a tab leaves a tombstone in its slot instead of shifting later tabs.
+  A Fenwick tree counts the open tabs up to each slot, so the tab at an index
+  is found by descending the tree. Slots are compacted once more than half
+  of them are tombstones, keeping removal O(log n) amortized.
+
+  TabList supports the list API, with insertions before the last tab,
+  sorting and reversing taking O(n). It compares equal to lists, and
+  concatenates with them into lists. As it is not a list subclass, convert
+  it with list() for code that requires one, e.g. json.dumps. Its repr and
+  str are TabList([...]) rather than a bare list.
+  """
+  _slots: list[str | None]
+  _counts: list[int]
+  _size: int
+
+  def __init__(self, tabs: Iterable[str] = ()):
+    self._rebuild(list(tabs))
+
+  def _rebuild(self, tabs: list[str]):
+    """Stores tabs without tombstones and builds the Fenwick tree in O(n)."""
+    self._slots = list(tabs)
+    self._size = len(tabs)
+    self._counts = [0] + [1] * len(tabs)
+    for position in range(1, len(self._counts)):
+      parent = position + (position & -position)
+      if parent < len(self._counts):
+        self._counts[parent] += self._counts[position]
+
+  def _prefix(self, position: int) -> int:
+    """Counts the open tabs in the first position slots."""
+    total = 0
+    while position:
+      total += self._counts[position]
+      position -= position & -position
+    return total
+
+  def _slot(self, index: int) -> int:
+    """Returns the slot holding the tab at index."""
+    if index < 0:
+      index += self._size
+    if index not in range(self._size):
+      raise IndexError("tab index out of range")
+
+    position = 0
+    step = 1 << len(self._slots).bit_length()
+    while step:
+      if (position + step < len(self._counts)
+          and self._counts[position + step] <= index):
+        position += step
+        index -= self._counts[position]
+      step >>= 1
+    return position
+
+  def __len__(self) -> int:
+    return self._size
+
+  @overload
+  def __getitem__(self, index: int) -> str:
+    ...
+
+  @overload
+  def __getitem__(self, index: slice) -> list[str]:
+    ...
+
+  def __getitem__(self, index: int | slice) -> str | list[str]:
+    if isinstance(index, slice):
+      return list(self)[index]
+    return self._slots[self._slot(index)]    # type: ignore
+
+  @overload
+  def __setitem__(self, index: int, tab: str):
+    ...
+
+  @overload
+  def __setitem__(self, index: slice, tab: Iterable[str]):
+    ...
+
+  def __setitem__(self, index: int | slice, tab: str | Iterable[str]):
+    if isinstance(index, slice):
+      tabs = list(self)
+      tabs[index] = tab    # type: ignore
+      self._rebuild(tabs)
+    else:
+      self._slots[self._slot(index)] = tab    # type: ignore
+
+  def __delitem__(self, index: int | slice):
+    if isinstance(index, slice):
+      tabs = list(self)
+      del tabs[index]
+      self._rebuild(tabs)
+    else:
+      self.pop(index)
+
+  def __iter__(self) -> Iterator[str]:
+    return (tab for tab in self._slots if tab is not None)
+
+  def __eq__(self, other: object) -> bool:
+    if not isinstance(other, (list, TabList)):
+      return NotImplemented
+    return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+  __hash__ = None    # type: ignore
+
+  def __add__(self, other: Iterable[str]) -> list[str]:
+    return list(self) + list(other)
+
+  def __radd__(self, other: Iterable[str]) -> list[str]:
+    return list(other) + list(self)
+
+  def __repr__(self) -> str:
+    return f"{type(self).__name__}({list(self)!r})"
+
+  def append(self, value: str):
+    """Opens a tab after every other tab."""
+    self._slots.append(value)
+    position = len(self._slots)
+    lowest_bit = position & -position
+    self._counts.append(1 + self._prefix(position - 1) -
+                        self._prefix(position - lowest_bit))
+    self._size += 1
+
+  def extend(self, values: Iterable[str]):
+    """Opens tabs after every other tab, in order."""
+    tabs = list(values)
+    if len(tabs) > self._size:
+      self._rebuild(list(self) + tabs)
+    else:
+      for tab in tabs:
+        self.append(tab)
+
+  def insert(self, index: int, value: str):
+    """Opens a tab before index, in O(log n) after every other tab."""
+    if index >= self._size:
+      self.append(value)
+    else:
+      tabs = list(self)
+      tabs.insert(index, value)
+      self._rebuild(tabs)
+
+  def copy(self) -> TabList:
+    """Returns a shallow copy, without tombstones."""
+    return TabList(self)
+
+  def __copy__(self) -> TabList:
+    return self.copy()
+
+  def sort(self,
+           *,
+           key: Callable[[str], Any] | None = None,
+           reverse: bool = False):
+    """Sorts the tabs in place."""
+    self._rebuild(sorted(self, key=key, reverse=reverse))    # type: ignore
+
+  def reverse(self):
+    """Reverses the tabs in place."""
+    self._rebuild(list(self)[::-1])
+
+  def clear(self):
+    """Removes every tab."""
+    self._rebuild([])
+
+  def delete_range(self, start: int, stop: int):
+    """Removes the tabs from start up to, but not including, stop in O(n)."""
+    tabs = list(self)
+    del tabs[start:stop]
+    self._rebuild(tabs)
+
+  def pop(self, index: int = -1) -> str:
+    """Removes and returns the tab at index."""
+    slot = self._slot(index)
+    tab = self._slots[slot]
+    self._slots[slot] = None
+
+    position = slot + 1
+    while position < len(self._counts):
+      self._counts[position] -= 1
+      position += position & -position
+    self._size -= 1
+
+    if self._size * 2 < len(self._slots):
+      self._rebuild(list(self))
+    return tab    # type: ignore
+
+
+@dataclass
+class Keystroke:
+  """A keystroke sent to a BrowserController as a Command."""
+  controller: BrowserController
+  key_combination: KeyCombination
+
+  def execute(self) -> str | None:
+    """Sends the keystroke to the controller."""
+    return self.controller.send_keystrokes(self.key_combination)
+
+
+class CommandDispatcher:
+  """Executes commands for a browser in order from a bounded asyncio queue.
+
+  Any number of producers submit commands, waiting while the queue is full,
+  and get back a future for each command's result. A single consumer task
+  executes the commands one at a time in submission order.
+
+  Example Usage:
+    async with CommandDispatcher(controller, maxsize=100) as dispatcher:
+      new_tab = KeyCombination(Key.T, Modifier.CTRL)
+      result = await dispatcher.send_keystrokes(new_tab)
+      print(await result, dispatcher.metrics())
+  """
+  controller: BrowserController
+  queue: asyncio.Queue[tuple[Command, asyncio.Future[Any]]]
+  submitted: int
+  completed: int
+  max_depth: int
+  started_at: float
+  consumer: asyncio.Task[None] | None
+
+  def __init__(self, controller: BrowserController, maxsize: int = 1024):
+    self.controller = controller
+    self.queue = asyncio.Queue(maxsize)
+    self.submitted = 0
+    self.completed = 0
+    self.max_depth = 0
+    self.started_at = time.perf_counter()
+    self.consumer = None
+
+  async def __aenter__(self) -> CommandDispatcher:
+    self.start()
+    return self
+
+  async def __aexit__(self, *_: Any):
+    await self.stop()
+
+  def start(self):
+    """Starts the consumer task on the running event loop."""
+    self.started_at = time.perf_counter()
+    self.consumer = asyncio.get_running_loop().create_task(self.consume())
+
+  async def stop(self):
+    """Waits for every queued command to finish, then stops the consumer."""
+    await self.queue.join()
+    if self.consumer:
+      self.consumer.cancel()
+      with contextlib.suppress(asyncio.CancelledError):
+        await self.consumer
+      self.consumer = None
+
+  async def submit(self, command: Command) -> asyncio.Future[Any]:
+    """Queues a command, waiting while the queue is full. Returns its future."""
+    future = asyncio.get_running_loop().create_future()
+    await self.queue.put((command, future))
+    self.submitted += 1
+    self.max_depth = max(self.max_depth, self.queue.qsize())
+    return future
+
+  async def send_keystrokes(
+      self, key_combination: KeyCombination) -> asyncio.Future[str | None]:
+    """Queues a keystroke for the controller, returning a future for it."""
+    return await self.submit(Keystroke(self.controller, key_combination))
+
+  async def consume(self):
+    """Executes queued commands in order, resolving their futures."""
+    while True:
+      command, future = await self.queue.get()
+      try:
+        result = command.execute()
+        if not future.cancelled():
+          future.set_result(result)
+      except Exception as error:    # pylint: disable=broad-except
+        if not future.cancelled():
+          future.set_exception(error)
+      finally:
+        self.completed += 1
+        self.queue.task_done()
+
+  def metrics(self) -> dict[str, float]:
+    """Returns queue depth and throughput of executed commands."""
+    elapsed = time.perf_counter() - self.started_at
+    return {
+        "submitted": self.submitted,
+        "completed": self.completed,
+        "depth": self.queue.qsize(),
+        "max_depth": self.max_depth,
+        "commands_per_second": self.completed / elapsed if elapsed else 0.0,
+    }
+
+
 class WebBrowser:
   """An app to view webpages."""
-  tabs: list[str]
+  _tabs: TabList
   active_tab_index: int
 
   def __init__(self, tabs: list[str] | None = None):
     self.tabs = tabs or ["google.com"]
     self.active_tab_index = 0
 
+  @property
+  def tabs(self) -> TabList:
+    return self._tabs
+
+  @tabs.setter
+  def tabs(self, tabs: Iterable[str]):
+    """Stores any iterable of tabs, such as a list, as a TabList."""
+    self._tabs = tabs if isinstance(tabs, TabList) else TabList(tabs)
+
   def next_tab_index(self):
     """Changes to the next tab index."""
     self.active_tab_index += 1
@@ -110,17 +438,61 @@ class WebBrowser:
     else:
       self.prev_tab_index()
 
+  def cycle_tab_by(self, steps: int):
+    """Cycles through the tab list by many steps, negative in reverse order."""
+    self.active_tab_index = (self.active_tab_index + steps) % len(self.tabs)
+
   def close_current_tab(self) -> str:
     """Removes current tab from tabs and adds it to closed tabs."""
-    tab = self.current_tab()
-    self.tabs.remove(tab)
+    tab = self.tabs.pop(self.active_tab_index)
     self.prev_tab_index()
     return tab
 
-  def close_all_tabs(self):
-    """Close all tabs and add it to closed tabs."""
-    while self.tabs:
-      self.close_current_tab()
+  def close_all_tabs(self) -> list[str]:
+    """Close all tabs and add it to closed tabs.
+
+    Returns the tabs in the order repeatedly closing the current tab would,
+    i.e. from the active tab back to the first, then from the last tab back.
+    """
+    if not self.tabs:
+      return []
+
+    index = self._closing_index()
+    closed_tabs = self.tabs[index::-1] + self.tabs[:index:-1]
+    self.tabs.clear()
+    self.active_tab_index = -1
+    return closed_tabs
+
+  def close_tabs(self, start: int, stop: int) -> list[str]:
+    """Closes the tabs from start up to, but not including, stop.
+
+    Leaves the same state and returns the tabs in the same order as
+    activating the tab before stop and closing the current tab repeatedly.
+    """
+    start, stop, _ = slice(start, stop).indices(len(self.tabs))
+    if start >= stop:
+      return []
+
+    closed_tabs = self.tabs[stop - 1:start - 1 if start else None:-1]
+    self.tabs.delete_range(start, stop)
+    self.active_tab_index = start - 1 if start else len(self.tabs) - 1
+    return closed_tabs
+
+  def open_tabs(self, tabs: Iterable[str]):
+    """Opens many tabs at once, leaving the last one active like new_tab."""
+    count = len(self.tabs)
+    self.tabs.extend(tabs)
+    if len(self.tabs) > count:
+      self.active_tab_index = len(self.tabs) - 1
+
+  def _closing_index(self) -> int:
+    """Returns the index close_current_tab would close, or raises IndexError."""
+    index = self.active_tab_index
+    if index < 0:
+      index += len(self.tabs)
+    if index not in range(len(self.tabs)):
+      raise IndexError("tab index out of range")
+    return index
 
 
 class BrowserCommand(ABC):
@@ -178,10 +550,74 @@ class CompositeBrowserCommand(BrowserCommand):
     self.commands.append(command)
 
   def execute(self) -> None:
-    """Executes all commands."""
-    for command in self.commands:
+    """Executes all commands, with runs of commands folded by optimize()."""
+    for command in self.optimize():
       command.execute()
 
+  def optimize(self) -> list[BrowserCommand]:
+    """Folds runs of consecutive commands into single, equivalent commands.
+
+    Runs of CycleTab and ReverseCycleTab on the same browser become CycleTabs.
+    Runs of NewTab on the same browser become NewTabs.
+    """
+    optimized_commands: list[BrowserCommand] = []
+    for kind, run in itertools.groupby(self.commands, key=self._fold_key):
+      commands = list(run)
+      if kind is None or len(commands) == 1:
+        optimized_commands.extend(commands)
+      elif kind[0] is CycleTab:
+        optimized_commands.append(CycleTabs(kind[1], commands))
+      else:
+        optimized_commands.append(NewTabs(kind[1], len(commands)))
+
+    return optimized_commands
+
+  @staticmethod
+  def _fold_key(command: BrowserCommand) -> tuple[type, WebBrowser] | None:
+    """Returns the kind of run a command can be folded into, if any.
+
+    Subclasses may change what a command does, so only exact types fold.
+    """
+    command_type = type(command)
+    if command_type in (CycleTab, ReverseCycleTab):
+      return (CycleTab, command.app)
+    if command_type is NewTab:
+      return (NewTab, command.app)
+    return None
+
+
+class CycleTabs(BrowserCommand):
+  """Cycles through open browser tabs by the net steps of cycle commands."""
+  commands: list[BrowserCommand]
+  steps: int
+
+  def __init__(self, app: WebBrowser, commands: list[BrowserCommand]):
+    super().__init__(app)
+    self.commands = commands
+    self.steps = sum(
+        1 if isinstance(command, CycleTab) else -1 for command in commands)
+
+  def execute(self) -> None:
+    """Moves the active tab index once, unless the index is out of range."""
+    if self.app.active_tab_index in range(len(self.app.tabs)):
+      self.app.cycle_tab_by(self.steps)
+    else:
+      for command in self.commands:
+        command.execute()
+
+
+class NewTabs(BrowserCommand):
+  """Opens many new browser tabs."""
+  count: int
+
+  def __init__(self, app: WebBrowser, count: int):
+    super().__init__(app)
+    self.count = count
+
+  def execute(self) -> None:
+    """Opens the new tabs at once."""
+    self.app.open_tabs(["New Tab"] * self.count)
+
 
 class ReversibleTabCommand(BrowserCommand, ABC):
   """Allows undo browser command."""
@@ -223,20 +659,45 @@ class UndoCloseTab(UndoBrowserCommand):
   def execute(self) -> None:
     """Opens the last closed tab."""
     try:
-      last_command = self.history.pop()
-      self.app.new_tab(last_command.closed_tab)
+      self.app.new_tab(self.history.pop())
     except IndexError:
       pass
 
 
 @dataclass
 class TabHistory:
-  history: list[ReversibleTabCommand] = field(default_factory=list)
+  """Closed tabs that can be reopened, most recently closed last.
+
+  Only the closed tab is kept, not the command that closed it.
+  With a capacity and/or a max_bytes budget, the oldest tabs are evicted
+  to stay within them. footprint is the size of the stored tabs in bytes.
+  """
+  history: deque[str] = field(default_factory=deque)
+  capacity: int | None = None
+  max_bytes: int | None = None
+  evictions: int = 0
+  footprint: int = 0
 
   def push(self, command: ReversibleTabCommand):
-    """Pushes a command to the end of history."""
-    self.history.append(command)
+    """Pushes a command's closed tab to the end of history."""
+    self.push_tab(command.closed_tab)
+
+  def push_tab(self, tab: str):
+    """Pushes a closed tab onto history, evicting the oldest tab if full."""
+    self.history.append(tab)
+    self.footprint += sys.getsizeof(tab)
+
+    while self.history and self.over_budget():
+      self.footprint -= sys.getsizeof(self.history.popleft())
+      self.evictions += 1
+
+  def pop(self) -> str:
+    """Pops the last closed tab in history."""
+    tab = self.history.pop()
+    self.footprint -= sys.getsizeof(tab)
+    return tab
 
-  def pop(self):
-    """Pops the last command in history."""
-    return self.history.pop()
+  def over_budget(self) -> bool:
+    """Whether history holds more tabs or bytes than allowed."""
+    return ((self.capacity is not None and len(self.history) > self.capacity)
+            or (self.max_bytes is not None and self.footprint > self.max_bytes))
@@ -0,0 +1,298 @@
+"""Journals browser commands to an append-only file to recover sessions.
+
+JournaledCommand decorates a BrowserCommand, recording the effect of each
+execution as a compact binary record. Replaying the journal rebuilds the
+WebBrowser from the latest checkpoint without re-executing any commands.
+
+The file starts with a header holding the offset of the latest checkpoint
+known to be on disk, so replay never reads the records before it.
+
+Example Usage:
+  browser = WebBrowser()
+  with CommandJournal("session.journal", browser) as journal:
+    new_tab = journal.journaled(NewTab(browser))
+    new_tab.execute()
+
+  recovered_browser = replay("session.journal")
+"""
+from __future__ import annotations
+from collections.abc import Iterator
+from enum import IntEnum
+import mmap
+import os
+import struct
+import time
+from typing import Any
+
+from patterns.behavioral.command.browser_commands import BrowserCommand, CloseAllTabs, CloseTab, CycleTab, NewTab, ReverseCycleTab, TabList, UndoCloseTab, WebBrowser
+
+MAGIC = b"JRNL"
+FILE_HEADER = struct.Struct("<4sq")
+HEADER = struct.Struct("<BI")
+CHECKPOINT_HEADER = struct.Struct("<qI")
+LENGTH = struct.Struct("<I")
+
+
+class Operation(IntEnum):
+  """The effect a journal record has on the browser."""
+  NEW_TAB = 1
+  CYCLE_TAB = 2
+  REVERSE_CYCLE_TAB = 3
+  CLOSE_TAB = 4
+  CLOSE_ALL_TABS = 5
+  CHECKPOINT = 6
+
+
+class CommandJournal:
+  """An append-only journal of a browser's commands.
+
+  Records are buffered and flushed to disk with fsync at most every
+  fsync_interval seconds. Every checkpoint_every records, the whole browser
+  state is written as a checkpoint, so replay time stays bounded.
+  Commands whose effect cannot be described by a single Operation are
+  recorded as a checkpoint.
+
+  After each sync, the file header is pointed at the latest checkpoint.
+  An existing journal at path is appended to, and an existing file that is
+  not a journal raises ValueError rather than being overwritten.
+  """
+  path: str
+  browser: WebBrowser
+  checkpoint_every: int
+  fsync_interval: float
+  records_since_checkpoint: int
+  last_checkpoint: int
+  last_sync: float
+
+  def __init__(self,
+               path: str,
+               browser: WebBrowser,
+               checkpoint_every: int = 1000,
+               fsync_interval: float = 1.0,
+               buffer_size: int = 64 * 1024):
+    self.path = path
+    self.browser = browser
+    self.checkpoint_every = checkpoint_every
+    self.fsync_interval = fsync_interval
+    self.records_since_checkpoint = 0
+    self.last_checkpoint = 0
+
+    length = valid_length(path) if os.path.exists(path) else 0
+    mode = "r+b" if length else "w+b"
+    # pylint: disable-next=consider-using-with
+    self.file = open(path, mode, buffering=buffer_size)
+    if length:
+      self.file.truncate(length)
+      self.file.seek(length)
+    else:
+      self.file.write(FILE_HEADER.pack(MAGIC, 0))
+    self.last_sync = time.monotonic()
+    self.checkpoint()
+
+  def __enter__(self) -> CommandJournal:
+    return self
+
+  def __exit__(self, *_: Any):
+    self.close()
+
+  def journaled(self, command: BrowserCommand) -> JournaledCommand:
+    """Wraps a command so every execution is recorded."""
+    return JournaledCommand(command, self)
+
+  def record(self, command: BrowserCommand, tab_count: int):
+    """Records the effect of a command run when tab_count tabs were open."""
+    command_type = type(command)
+    tab_opened = len(self.browser.tabs) == tab_count + 1
+
+    if command_type in (NewTab, UndoCloseTab) and tab_opened:
+      self.append(Operation.NEW_TAB, self.browser.current_tab().encode())
+    elif command_type is UndoCloseTab and len(self.browser.tabs) == tab_count:
+      pass
+    elif command_type is CycleTab:
+      self.append(Operation.CYCLE_TAB)
+    elif command_type is ReverseCycleTab:
+      self.append(Operation.REVERSE_CYCLE_TAB)
+    elif command_type is CloseTab:
+      self.append(Operation.CLOSE_TAB)
+    elif command_type is CloseAllTabs:
+      self.append(Operation.CLOSE_ALL_TABS)
+    else:
+      self.checkpoint()
+
+  def append(self, operation: Operation, payload: bytes = b""):
+    """Appends a record, checkpointing and syncing when due."""
+    if operation == Operation.CHECKPOINT:
+      self.last_checkpoint = self.file.tell()
+    self.file.write(HEADER.pack(operation, len(payload)))
+    self.file.write(payload)
+
+    if operation == Operation.CHECKPOINT:
+      self.records_since_checkpoint = 0
+    else:
+      self.records_since_checkpoint += 1
+      if self.records_since_checkpoint >= self.checkpoint_every:
+        self.checkpoint()
+
+    if time.monotonic() - self.last_sync >= self.fsync_interval:
+      self.sync()
+
+  def checkpoint(self):
+    """Records the browser's entire state."""
+    tabs = [tab.encode() for tab in self.browser.tabs]
+    payload = b"".join([
+        CHECKPOINT_HEADER.pack(self.browser.active_tab_index, len(tabs)),
+        *(LENGTH.pack(len(tab)) + tab for tab in tabs),
+    ])
+    self.append(Operation.CHECKPOINT, payload)
+
+  def sync(self):
+    """Flushes buffered records and forces them to disk.
+
+    Only then is the header pointed at the latest checkpoint, so it never
+    points at a checkpoint that is not yet on disk.
+    """
+    self.file.flush()
+    os.fsync(self.file.fileno())
+    header = FILE_HEADER.pack(MAGIC, self.last_checkpoint)
+    os.pwrite(self.file.fileno(), header, 0)
+    self.last_sync = time.monotonic()
+
+  def close(self):
+    """Syncs and closes the journal file."""
+    if not self.file.closed:
+      self.sync()
+      self.file.close()
+
+
+class JournaledCommand(BrowserCommand):
+  """Records the effect of a browser command every time it executes."""
+  command: BrowserCommand
+  journal: CommandJournal
+
+  def __init__(self, command: BrowserCommand, journal: CommandJournal):
+    super().__init__(command.app)
+    self.command = command
+    self.journal = journal
+
+  def execute(self) -> str | None:
+    """Executes the command, then records its effect."""
+    tab_count = len(self.app.tabs)
+    result = self.command.execute()
+    self.journal.record(self.command, tab_count)
+    return result
+
+
+def records(buffer: Any,
+            start: int = FILE_HEADER.size) -> Iterator[tuple[int, int, int]]:
+  """Yields the operation, payload offset and payload length of each record.
+
+  Stops before a partially written last record.
+  """
+  offset = start
+  while offset + HEADER.size <= len(buffer):
+    operation, length = HEADER.unpack_from(buffer, offset)
+    if offset + HEADER.size + length > len(buffer):
+      return
+    yield operation, offset + HEADER.size, length
+    offset += HEADER.size + length
+
+
+def valid_length(path: str) -> int:
+  """Returns the length of the journal without a partially written last record.
+
+  Returns 0 if the file is empty or its header was cut short, and raises
+  ValueError if it holds anything other than a journal.
+  """
+  with open(path, "rb") as file:
+    if not MAGIC.startswith(file.read(len(MAGIC))):
+      raise ValueError(f"{path} is not a journal")
+    if os.fstat(file.fileno()).st_size < FILE_HEADER.size:
+      return 0
+
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+      length = FILE_HEADER.size
+      start = latest_checkpoint(buffer)
+      for _, offset, payload_length in records(buffer, start):
+        length = offset + payload_length
+  return length
+
+
+def latest_checkpoint(buffer: Any) -> int:
+  """Returns the offset of the checkpoint the header points at, if it is whole.
+
+  Otherwise returns the offset of the first record, to scan from there.
+  """
+  _, checkpoint = FILE_HEADER.unpack_from(buffer)
+  if FILE_HEADER.size <= checkpoint <= len(buffer) - HEADER.size:
+    operation, length = HEADER.unpack_from(buffer, checkpoint)
+    if (operation == Operation.CHECKPOINT
+        and checkpoint + HEADER.size + length <= len(buffer)):
+      return checkpoint
+  return FILE_HEADER.size
+
+
+def replay(path: str) -> WebBrowser:
+  """Rebuilds a browser from the journal at path.
+
+  The journal is memory-mapped and read from the checkpoint the header
+  points at, so replay time depends on the records written since then,
+  not on the journal's length. Later checkpoints replace the state as they
+  are found. Records are applied directly to a list of tabs rather than
+  through command objects.
+  """
+  with open(path, "rb") as file:
+    if os.fstat(file.fileno()).st_size < FILE_HEADER.size:
+      raise ValueError(f"{path} is an empty journal")
+
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+      if FILE_HEADER.unpack_from(buffer)[0] != MAGIC:
+        raise ValueError(f"{path} is not a journal")
+
+      checkpoint = latest_checkpoint(buffer)
+      if (len(buffer) < checkpoint + HEADER.size
+          or HEADER.unpack_from(buffer, checkpoint)[0] != Operation.CHECKPOINT):
+        raise ValueError(f"{path} has no checkpoint")
+
+      tabs: list[str] = []
+      active_tab_index = 0
+      for operation, offset, length in records(buffer, checkpoint):
+        if operation == Operation.NEW_TAB:
+          tabs.append(buffer[offset:offset + length].decode())
+          active_tab_index = len(tabs) - 1
+
+        elif operation == Operation.CYCLE_TAB:
+          active_tab_index += 1
+          if active_tab_index not in range(len(tabs)):
+            active_tab_index = 0
+
+        elif operation == Operation.REVERSE_CYCLE_TAB:
+          active_tab_index -= 1
+          if active_tab_index not in range(len(tabs)):
+            active_tab_index = len(tabs) - 1
+
+        elif operation == Operation.CLOSE_TAB:
+          del tabs[active_tab_index]
+          active_tab_index -= 1
+          if active_tab_index not in range(len(tabs)):
+            active_tab_index = len(tabs) - 1
+
+        elif operation == Operation.CLOSE_ALL_TABS:
+          if tabs:
+            tabs.clear()
+            active_tab_index = -1
+
+        elif operation == Operation.CHECKPOINT:
+          active_tab_index, count = CHECKPOINT_HEADER.unpack_from(
+              buffer, offset)
+          offset += CHECKPOINT_HEADER.size
+          tabs = []
+          for _ in range(count):
+            (tab_length,) = LENGTH.unpack_from(buffer, offset)
+            offset += LENGTH.size
+            tabs.append(buffer[offset:offset + tab_length].decode())
+            offset += tab_length
+
+  browser = WebBrowser()
+  browser.tabs = TabList(tabs)
+  browser.active_tab_index = active_tab_index
+  return browser
@@ -14,19 +14,32 @@ Each case could require a new iteration algorithm to produce the desired order.
 
 from __future__ import annotations
 from abc import ABC
-from collections.abc import Iterator
-from dataclasses import dataclass
+from array import array
+import bisect
+from collections import deque
+from collections.abc import Callable, Hashable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+import functools
+import mmap
+import os
+import struct
+import sys
 from typing import Any, Generic, TypeVar
 
 
 class Node(ABC):
   """A node containing a value."""
+  __slots__ = ()
   value: Any
 
 
 @dataclass
 class TreeNode(Node):
-  """A node containing a value and up to two children."""
+  """A node containing a value and up to two children.
+
+  Comparison and repr are iterative, so they work on trees of any depth.
+  """
   value: int
   left: TreeNode | None = None
   right: TreeNode | None = None
@@ -34,8 +47,46 @@ class TreeNode(Node):
   def __str__(self) -> str:
     return str(self.value)
 
+  def __repr__(self) -> str:
+
+    def child(node: TreeNode | None) -> str:
+      if not node:
+        return "None"
+      return f"{type(node).__name__}(value={node.value!r}, ...)"
+
+    return (f"{type(self).__name__}(value={self.value!r}, "
+            f"left={child(self.left)}, right={child(self.right)})")
+
+  def __eq__(self, other: object) -> bool:
+    if not isinstance(other, TreeNode):
+      return NotImplemented
+
+    pairs: list[tuple[TreeNode | None, TreeNode | None]] = [(self, other)]
+    while pairs:
+      node, other_node = pairs.pop()
+      if node is other_node:
+        continue
+      if node is None or other_node is None or node.value != other_node.value:
+        return False
+      pairs.append((node.left, other_node.left))
+      pairs.append((node.right, other_node.right))
+
+    return True
+
+
+@dataclass(eq=False, repr=False)
+class AVLNode(TreeNode):
+  """A tree node that also tracks the height of its subtree.
+
+  Only balanced Trees use AVLNodes, as only they maintain the height.
+  """
+  left: AVLNode | None = None
+  right: AVLNode | None = None
+  height: int = 1
+
 
 Nodes = TypeVar("Nodes", bound=Node)
+Partial = TypeVar("Partial")
 
 
 class Collection(ABC, Generic[Nodes]):
@@ -44,22 +95,220 @@ class Collection(ABC, Generic[Nodes]):
 
 
 class Tree(Collection[TreeNode]):
-  """A collection of tree nodes."""
+  """A collection of tree nodes.
+
+  Values are inserted as in a binary search tree, equal values to the right.
+  A balanced Tree rebalances itself as an AVL tree after every insertion,
+  keeping its height O(log n) even for sorted input. Rotations preserve the
+  in-order sequence, but may move an equal value into a left subtree.
+  Its nodes are AVLNodes, which track their height.
+
+  Unless cache_traversals is False, the order each kind of traversal visits
+  nodes in is cached and shared by every iterator of that kind, until
+  add_node changes the version. Code that links nodes directly should call
+  clear_traversal_cache afterwards.
+  """
   root: TreeNode
-
-  def __init__(self, value: int = 0):
-    self.root = TreeNode(value)
-
-  def preorder_dfs(self) -> PreorderDFS:
+  balanced: bool
+  version: int
+  cache_traversals: bool
+  traversals: dict[Hashable, CachedTraversal]
+  array_tree_cache: tuple[int, TreeNode, ArrayTree] | None
+
+  def __init__(self,
+               value: int = 0,
+               balanced: bool = False,
+               cache_traversals: bool = True):
+    self.balanced = balanced
+    self.root = self.node_type(value)
+    self.version = 0
+    self.cache_traversals = cache_traversals
+    self.traversals = {}
+    self.array_tree_cache = None
+
+  @classmethod
+  def from_values(cls, values: Iterable[int], balanced: bool = False) -> Tree:
+    """Builds a tree from values, rooting each subtree at its middle value.
+
+    Sorting already sorted input is linear. With distinct values, the tree
+    is height-balanced and built in O(n) after sorting.
+
+    Equal values must end up in the right subtree, as with add_node, so each
+    middle is moved back to the first of its equal values with a bisect.
+    Heavy duplicates therefore cost O(n log n) and unbalance the tree:
+    all-equal values form a right chain of height n, as add_node would.
+    Balanced trees may place equal values on either side instead, as their
+    rotations do, so they stay height-balanced and O(n) with duplicates.
+    """
+    values = sorted(values)
+    if not values:
+      raise ValueError("a Tree needs at least one value")
+
+    def middle(low: int, high: int) -> int:
+      mid = (low + high) // 2
+      if not balanced and mid > low and values[mid - 1] == values[mid]:
+        mid = bisect.bisect_left(values, values[mid], low, mid)
+      return mid
+
+    tree = cls(values[middle(0, len(values))], balanced)
+    stack = [(0, len(values), tree.root)]
+    while stack:
+      low, high, node = stack.pop()
+      mid = middle(low, high)
+      if mid > low:
+        node.left = tree.node_type(values[middle(low, mid)])
+        stack.append((low, mid, node.left))
+      if high > mid + 1:
+        node.right = tree.node_type(values[middle(mid + 1, high)])
+        stack.append((mid + 1, high, node.right))
+
+    if balanced:
+      for node in PreorderDFS(tree):
+        update_height(node)
+
+    return tree
+
+  @property
+  def node_type(self) -> type[TreeNode]:
+    """The class of this tree's nodes."""
+    return AVLNode if self.balanced else TreeNode
+
+  def preorder_dfs(self) -> Iterator[TreeNode]:
     """Return Preorder DFS Tree Iterator."""
-    return PreorderDFS(self)
+    return self.cached("preorder_dfs", lambda: PreorderDFS(self))
 
-  def bfs(self) -> BreadthFirstSearch:
+  def bfs(self) -> Iterator[TreeNode]:
     """Return BFS Tree Iterator."""
-    return BreadthFirstSearch(self)
+    return self.cached("bfs", lambda: BreadthFirstSearch(self))
+
+  def inorder_dfs(self, reverse: bool = False) -> Iterator[TreeNode]:
+    """Return In-order DFS Tree Iterator, visiting values in sorted order."""
+    return self.cached(("inorder_dfs", reverse),
+                       lambda: InorderDFS(self, reverse=reverse))
+
+  def cached(self, kind: Hashable,
+             traverse: Callable[[], Iterator[TreeNode]]) -> Iterator[TreeNode]:
+    """Returns a cursor over the cached traversal of a kind.
+
+    A traversal is started by the first cursor of its version to need a node,
+    and is shared with every later cursor. Once complete, cursors are plain
+    list iterators.
+    """
+    if not self.cache_traversals:
+      return traverse()
+
+    traversal = self.traversals.get(kind)
+    if (traversal is None or traversal.version != self.version
+        or traversal.root is not self.root):
+      traversal = CachedTraversal(self.version, self.root, traverse())
+      self.traversals[kind] = traversal
+    if traversal.source is None:
+      return iter(traversal.nodes)
+    return TraversalCursor(traversal)
+
+  def clear_traversal_cache(self):
+    """Discards every cached traversal."""
+    self.traversals.clear()
+    self.array_tree_cache = None
+
+  def save(self, path: str):
+    """Writes the tree to path in the compact binary format."""
+    save_nodes(path, self, self.balanced)
+
+  @classmethod
+  def load(cls, path: str) -> Tree:
+    """Rebuilds a tree saved to path in linear time."""
+    with open(path, "rb") as file:
+      data = file.read()
+    balanced, values, bitmap = parse(data)
+    if sys.byteorder == "big":
+      values = array("q", values)    # type: ignore
+      values.byteswap()
+
+    lefts, rights = child_indices(bitmap, len(values))
+    tree = cls(balanced=balanced)
+    nodes = [tree.node_type(value) for value in values]
+    for node, left, right in zip(nodes, lefts, rights):
+      if left != NO_NODE:
+        node.left = nodes[left]
+      if right != NO_NODE:
+        node.right = nodes[right]
+
+    if balanced:
+      for node in reversed(nodes):
+        update_height(node)
+
+    tree.root = nodes[0]
+    return tree
+
+  def aggregate(self,
+                reducer: Callable[[Iterable[int]], Partial],
+                combine: Callable[[Partial, Partial], Partial],
+                split_depth: int = 4,
+                workers: int | None = None) -> Partial:
+    """Reduces the tree's values across worker processes.
+
+    The parts and their order are the same as for ArrayTree.aggregate.
+    With a single worker, the nodes are reduced where they are. Otherwise
+    the tree is copied into an ArrayTree to ship to the workers, which is
+    cached until the tree changes.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers > 1:
+      return self.array_tree().aggregate(reducer, combine, split_depth, workers)
+
+    above, level = [], [self.root]
+    for _ in range(split_depth):
+      above.extend(level)
+      level = [
+          child for node in level for child in (node.left, node.right) if child
+      ]
+    partials = [reducer(node.value for node in above)] if above else []
+    partials.extend(reducer(subtree_values(node)) for node in level)
+    return functools.reduce(combine, partials)
+
+  def array_tree(self) -> ArrayTree:
+    """Returns a copy of the tree as an ArrayTree, cached like traversals."""
+    if self.array_tree_cache:
+      version, root, array_tree = self.array_tree_cache
+      if version == self.version and root is self.root:
+        return array_tree
+
+    array_tree = ArrayTree.from_tree(self)
+    if self.cache_traversals:
+      self.array_tree_cache = (self.version, self.root, array_tree)
+    return array_tree
+
+  @property
+  def cache_nbytes(self) -> int:
+    """The bytes held by cached traversals, not counting the shared nodes."""
+    nbytes = sum(
+        sys.getsizeof(traversal.nodes)
+        for traversal in self.traversals.values())
+    if self.array_tree_cache:
+      nbytes += self.array_tree_cache[2].nbytes
+    return nbytes
+
+  def range_search(self,
+                   low: int | None = None,
+                   high: int | None = None,
+                   reverse: bool = False) -> InorderDFS:
+    """Return In-order DFS Tree Iterator over values in [low, high)."""
+    return InorderDFS(self, low, high, reverse)
+
+  def count_in_range(self,
+                     low: int | None = None,
+                     high: int | None = None) -> int:
+    """Counts the values in [low, high) without collecting them."""
+    return sum(1 for _ in self.range_search(low, high))
 
   def add_node(self, value: int):
     """Add nodes to tree based on value."""
+    self.version += 1
+    if self.balanced:
+      self.add_balanced_node(value)
+      return
+
     node = self.root
     while True:
       if value >= node.value:
@@ -75,64 +324,604 @@ class Tree(Collection[TreeNode]):
         else:
           node = node.left
 
+  def add_balanced_node(self, value: int):
+    """Add nodes to tree based on value, then rebalance the path to the node."""
+    assert isinstance(self.root, AVLNode)
+    path: list[AVLNode] = []
+    node: AVLNode | None = self.root
+    while node:
+      path.append(node)
+      node = node.right if value >= node.value else node.left
+
+    if value >= path[-1].value:
+      path[-1].right = AVLNode(value)
+    else:
+      path[-1].left = AVLNode(value)
+
+    for index in range(len(path) - 1, -1, -1):
+      node = path[index]
+      old_height = node.height
+      subtree = rebalance(node)
+
+      if subtree is not node:
+        if index == 0:
+          self.root = subtree
+        elif path[index - 1].left is node:
+          path[index - 1].left = subtree
+        else:
+          path[index - 1].right = subtree
+
+      if subtree.height == old_height:
+        break
+
+
+@dataclass
+class CachedTraversal:
+  """The nodes a traversal of one version of a tree has visited so far.
+
+  The traversal continues only when a cursor reaches the last visited node.
+  """
+  version: int
+  root: TreeNode
+  source: Iterator[TreeNode] | None
+  nodes: list[TreeNode] = field(default_factory=list)
+
+  def advance(self):
+    """Visits the next node, or raises StopIteration once all are visited."""
+    if self.source is None:
+      raise StopIteration
+    try:
+      self.nodes.append(next(self.source))
+    except StopIteration:
+      self.source = None
+      raise
+
+
+class TraversalCursor(Iterator[TreeNode]):
+  """Lazily visits the nodes of a cached traversal."""
+  __slots__ = ("traversal", "index")
+  traversal: CachedTraversal
+  index: int
+
+  def __init__(self, traversal: CachedTraversal) -> None:
+    self.traversal = traversal
+    self.index = 0
+
+  def __next__(self) -> TreeNode:
+    """Returns the next cached tree node, extending the traversal if needed."""
+    if self.index == len(self.traversal.nodes):
+      self.traversal.advance()
+    self.index += 1
+    return self.traversal.nodes[self.index - 1]
+
+
+MAGIC = b"TREE"
+FILE_HEADER = struct.Struct("<4sB3xQ")
+BALANCED = 1
+HAS_LEFT = 1
+HAS_RIGHT = 2
+
+
+def save_nodes(path: str, collection: Collection[Any], balanced: bool = False):
+  """Writes the nodes of a collection to path in level order.
+
+  The file is a 16 byte header holding the magic, flags and node count,
+  followed by every value as a little-endian int64, then a bitmap with
+  2 bits per node saying whether it has a left and a right child.
+  Children are the next unclaimed nodes in level order, so no indices
+  are stored.
+  """
+  values = array("q")
+  bitmap = bytearray()
+  for index, node in enumerate(BreadthFirstSearch(collection)):
+    values.append(node.value)
+    if not index & 3:
+      bitmap.append(0)
+    bits = (HAS_LEFT if node.left else 0) | (HAS_RIGHT if node.right else 0)
+    bitmap[-1] |= bits << ((index & 3) << 1)
+
+  if sys.byteorder == "big":
+    values.byteswap()
+  with open(path, "wb") as file:
+    flags = BALANCED if balanced else 0
+    file.write(FILE_HEADER.pack(MAGIC, flags, len(values)))
+    values.tofile(file)
+    file.write(bitmap)
+
+
+def parse(buffer: Any) -> tuple[bool, memoryview, memoryview]:
+  """Returns the balanced flag, values and bitmap of a saved tree."""
+  if len(buffer) < FILE_HEADER.size:
+    raise ValueError("not a saved Tree: too short")
+  magic, flags, count = FILE_HEADER.unpack_from(buffer)
+  if magic != MAGIC:
+    raise ValueError("not a saved Tree: bad magic")
+  if not count:
+    raise ValueError("a Tree needs at least one value")
+
+  values_end = FILE_HEADER.size + 8 * count
+  if len(buffer) != values_end + (count + 3) // 4:
+    raise ValueError("saved Tree is truncated")
+  view = memoryview(buffer)
+  return (bool(flags & BALANCED), view[FILE_HEADER.size:values_end].cast("q"),
+          view[values_end:])
+
+
+def subtree_values(node: TreeNode) -> Iterator[int]:
+  """Yields the values of the subtree rooted at node, parents first."""
+  stack = [node]
+  while stack:
+    node = stack.pop()
+    if node.right:
+      stack.append(node.right)
+    if node.left:
+      stack.append(node.left)
+    yield node.value
+
+
+def child_indices(bitmap: memoryview,
+                  count: int) -> tuple[array[int], array[int]]:
+  """Returns the left and right child indices of a saved tree's nodes."""
+  lefts = array("i", [NO_NODE]) * count
+  rights = array("i", [NO_NODE]) * count
+  child = 1
+  for index in range(count):
+    bits = bitmap[index >> 2] >> ((index & 3) << 1)
+    if bits & HAS_LEFT:
+      lefts[index] = child
+      child += 1
+    if bits & HAS_RIGHT:
+      rights[index] = child
+      child += 1
+
+  if child != count:
+    raise ValueError("saved Tree has a corrupt child bitmap")
+  return lefts, rights
+
+
+def height(node: AVLNode | None) -> int:
+  """Returns the height of a subtree."""
+  return node.height if node else 0
+
+
+def update_height(node: AVLNode):
+  """Recomputes a node's height from its children."""
+  node.height = 1 + max(height(node.left), height(node.right))
+
+
+def rotate_left(node: AVLNode) -> AVLNode:
+  """Rotates a subtree left, returning its new root."""
+  pivot = node.right
+  assert pivot
+  node.right = pivot.left
+  pivot.left = node
+  update_height(node)
+  update_height(pivot)
+  return pivot
+
+
+def rotate_right(node: AVLNode) -> AVLNode:
+  """Rotates a subtree right, returning its new root."""
+  pivot = node.left
+  assert pivot
+  node.left = pivot.right
+  pivot.right = node
+  update_height(node)
+  update_height(pivot)
+  return pivot
+
+
+def rebalance(node: AVLNode) -> AVLNode:
+  """Restores the AVL balance of a subtree, returning its new root."""
+  update_height(node)
+  balance = height(node.left) - height(node.right)
+
+  if balance > 1:
+    assert node.left
+    if height(node.left.left) < height(node.left.right):
+      node.left = rotate_left(node.left)
+    return rotate_right(node)
+
+  if balance < -1:
+    assert node.right
+    if height(node.right.right) < height(node.right.left):
+      node.right = rotate_right(node.right)
+    return rotate_left(node)
+
+  return node
+
 
 class PreorderDFS(Iterator[TreeNode]):
+  """Lazily visits each node after its left and right subtrees.
+
+  An explicit stack holds only the current path and the right children
+  waiting beside it, so memory is O(height).
+  """
   collection: Collection[TreeNode]
-  stack: list[TreeNode]
-  index: int = 0
+  nodes: Iterator[TreeNode]
 
   def __init__(self, collection: Collection[TreeNode]) -> None:
     self.collection = collection
-    self.stack = []
-    self.traverse(collection.root)
-    print(self.collection)
+    self.nodes = self.traverse(collection.root)
 
   def __next__(self):
     """Returns the next tree node when performing DFS traversal of a tree."""
-    try:
-      node = self.stack[self.index]
-      self.index += 1
-    except IndexError:
-      raise StopIteration
+    return next(self.nodes)
+
+  def traverse(self, node: TreeNode) -> Iterator[TreeNode]:
+    """Iterative traversal algorithm."""
+    stack: list[tuple[TreeNode, bool]] = [(node, False)]
+    while stack:
+      node, children_visited = stack.pop()
+      if children_visited:
+        yield node
+        continue
+
+      stack.append((node, True))
+      if node.right:
+        stack.append((node.right, False))
+      if node.left:
+        stack.append((node.left, False))
 
-    return node
 
-  def traverse(self, node: TreeNode):
-    """Recursive traversal algorithm."""
-    if node.left:
-      self.traverse(node.left)
-    if node.right:
-      self.traverse(node.right)
+class InorderDFS(Iterator[TreeNode]):
+  """Lazily visits nodes in sorted order, or reverse sorted order.
 
-    print(node)
-    self.stack.append(node)
+  Only values in [low, high) are visited, where a bound of None is unbounded.
+  Subtrees that cannot hold such values are never entered, so a range of
+  k values in a balanced tree costs O(log n + k). Memory is O(height).
+  """
+  collection: Collection[TreeNode]
+  low: int | None
+  high: int | None
+  reverse: bool
+  nodes: Iterator[TreeNode]
+
+  def __init__(self,
+               collection: Collection[TreeNode],
+               low: int | None = None,
+               high: int | None = None,
+               reverse: bool = False) -> None:
+    self.collection = collection
+    self.low = low
+    self.high = high
+    self.reverse = reverse
+    self.nodes = self.traverse(collection.root)
+
+  def __next__(self):
+    """Returns the next tree node when performing in-order traversal."""
+    return next(self.nodes)
+
+  def lower(self, node: TreeNode) -> TreeNode | None:
+    """Returns the left child, unless its values are all below the range.
+
+    Left subtrees hold values up to the node's value, as rotations in balanced
+    trees can move equal values left.
+    """
+    return node.left if self.low is None or node.value >= self.low else None
+
+  def higher(self, node: TreeNode) -> TreeNode | None:
+    """Returns the right child, unless its values are all above the range."""
+    return node.right if self.high is None or node.value < self.high else None
+
+  def traverse(self, node: TreeNode) -> Iterator[TreeNode]:
+    """Iterative traversal algorithm."""
+    first, second = self.lower, self.higher
+    if self.reverse:
+      first, second = second, first
+    stack: list[TreeNode] = []
+    current: TreeNode | None = node
+
+    while stack or current:
+      while current:
+        stack.append(current)
+        current = first(current)
+
+      node = stack.pop()
+      if ((self.low is None or node.value >= self.low)
+          and (self.high is None or node.value < self.high)):
+        yield node
+      current = second(node)
 
 
 class BreadthFirstSearch(Iterator[TreeNode]):
+  """Lazily visits nodes level by level.
+
+  A queue holds only the frontier, so memory is O(width).
+  """
   collection: Collection[TreeNode]
-  stack: list[TreeNode]
-  index: int = 0
+  nodes: Iterator[TreeNode]
 
   def __init__(self, collection: Collection[TreeNode]) -> None:
     self.collection = collection
-    self.stack = []
-    self.traverse(collection.root)
+    self.nodes = self.traverse(collection.root)
 
   def __next__(self):
     """Returns the next tree node when performing BFS traversal of a tree."""
-    try:
-      node = self.stack[self.index]
-      self.index += 1
-    except IndexError:
-      raise StopIteration
+    return next(self.nodes)
+
+  def traverse(self, node: TreeNode) -> Iterator[TreeNode]:
+    """Iterative traversal algorithm."""
+    queue = deque([node])
+    while queue:
+      node = queue.popleft()
+      if node.left:
+        queue.append(node.left)
+      if node.right:
+        queue.append(node.right)
+      yield node
+
+
+class NodeView(Node):
+  """A lightweight view of a node stored in an ArrayTree."""
+  __slots__ = ("tree", "index")
+  tree: ArrayTree
+  index: int
+
+  def __init__(self, tree: ArrayTree, index: int):
+    self.tree = tree
+    self.index = index
+
+  @property
+  def value(self) -> int:    # type: ignore
+    return self.tree.values[self.index]
+
+  @property
+  def left(self) -> NodeView | None:
+    index = self.tree.lefts[self.index]
+    return NodeView(self.tree, index) if index != NO_NODE else None
 
-    return node
+  @property
+  def right(self) -> NodeView | None:
+    index = self.tree.rights[self.index]
+    return NodeView(self.tree, index) if index != NO_NODE else None
 
-  def traverse(self, node: TreeNode):
-    """Recursive traversal algorithm."""
-    self.stack.append(node)
-    for node in self.stack:
+  def __eq__(self, other: object) -> bool:
+    if not isinstance(other, NodeView):
+      return NotImplemented
+    return self.tree is other.tree and self.index == other.index
+
+  def __hash__(self) -> int:
+    return hash((id(self.tree), self.index))
+
+  def __str__(self) -> str:
+    return str(self.value)
+
+  def __repr__(self) -> str:
+    return f"{type(self).__name__}(index={self.index}, value={self.value!r})"
+
+
+NO_NODE = -1
+
+
+class ArrayTree(Collection[NodeView]):
+  """A collection of tree nodes stored in parallel typed arrays.
+
+  Node i has its value at values[i] and the indices of its children at
+  lefts[i] and rights[i], or NO_NODE. Nodes are allocated from an arena,
+  i.e. by appending to the arrays, so each node costs 16 bytes rather
+  than a TreeNode object and its attribute dict.
+
+  The usual iterators walk NodeViews over the arrays. With raw=True,
+  they yield the values directly without creating any node objects.
+
+  A loaded ArrayTree reads its values straight from the memory-mapped file
+  and is read-only.
+  """
+  values: array[int] | memoryview
+  lefts: array[int]
+  rights: array[int]
+  readonly: bool = False
+
+  def __init__(self, value: int = 0):
+    self.values = array("q")
+    self.lefts = array("i")
+    self.rights = array("i")
+    self.allocate(value)
+
+  @classmethod
+  def from_tree(cls, tree: Tree) -> ArrayTree:
+    """Copies a Tree's nodes into arrays in breadth first order.
+
+    Children come next in breadth first order, so their indices are counted
+    rather than looked up.
+    """
+    nodes = list(BreadthFirstSearch(tree))
+    lefts = array("i", [NO_NODE]) * len(nodes)
+    rights = array("i", [NO_NODE]) * len(nodes)
+    child = 1
+    for index, node in enumerate(nodes):
       if node.left:
-        self.stack.append(node.left)
+        lefts[index] = child
+        child += 1
       if node.right:
-        self.stack.append(node.right)
+        rights[index] = child
+        child += 1
+    return cls.from_arrays(array("q", [node.value for node in nodes]), lefts,
+                           rights)
+
+  @classmethod
+  def load(cls, path: str) -> ArrayTree:
+    """Memory-maps a tree saved to path, computing child indices in one pass.
+
+    Values are a zero-copy view of the file, except on big-endian machines,
+    where they are copied and byteswapped.
+    """
+    with open(path, "rb") as file:
+      buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    _, values, bitmap = parse(buffer)
+    if sys.byteorder == "big":
+      values = array("q", values)    # type: ignore
+      values.byteswap()
+
+    lefts, rights = child_indices(bitmap, len(values))
+    return cls.from_arrays(values, lefts, rights, readonly=True)
+
+  @classmethod
+  def from_arrays(cls,
+                  values: array[int] | memoryview,
+                  lefts: array[int],
+                  rights: array[int],
+                  readonly: bool = False) -> ArrayTree:
+    """Wraps existing arrays without copying them."""
+    array_tree = cls.__new__(cls)
+    array_tree.values = values
+    array_tree.lefts, array_tree.rights = lefts, rights
+    array_tree.readonly = readonly
+    return array_tree
+
+  def save(self, path: str):
+    """Writes the tree to path in the compact binary format."""
+    save_nodes(path, self)
+
+  @property
+  def root(self) -> NodeView:    # type: ignore
+    return NodeView(self, 0)
+
+  def __len__(self) -> int:
+    return len(self.values)
+
+  @property
+  def nbytes(self) -> int:
+    """The bytes held by the arrays, or by the mapped file for loaded values."""
+    return sum(
+        len(column) * column.itemsize
+        for column in (self.values, self.lefts, self.rights))
+
+  def allocate(self, value: int) -> int:
+    """Allocates a childless node, returning its index."""
+    if self.readonly:
+      raise TypeError("a loaded ArrayTree is read-only")
+    self.values.append(value)    # type: ignore
+    self.lefts.append(NO_NODE)
+    self.rights.append(NO_NODE)
+    return len(self.values) - 1
+
+  def add_node(self, value: int):
+    """Add nodes to tree based on value."""
+    index = 0
+    while True:
+      children = self.rights if value >= self.values[index] else self.lefts
+      if children[index] == NO_NODE:
+        children[index] = self.allocate(value)
+        break
+      index = children[index]
+
+  def preorder_dfs(self, raw: bool = False) -> Iterator[Any]:
+    """Return Preorder DFS Tree Iterator, over values if raw."""
+    if raw:
+      return self.raw_preorder_dfs()
+    return PreorderDFS(self)    # type: ignore
+
+  def bfs(self, raw: bool = False) -> Iterator[Any]:
+    """Return BFS Tree Iterator, over values if raw."""
+    return self.raw_bfs() if raw else BreadthFirstSearch(self)    # type: ignore
+
+  def raw_preorder_dfs(self) -> Iterator[int]:
+    """Yields values in the same order as PreorderDFS, walking indices."""
+    values, lefts, rights = self.values, self.lefts, self.rights
+    stack = [0]
+    while stack:
+      index = stack.pop()
+      if index < 0:
+        yield values[~index]
+        continue
+
+      stack.append(~index)
+      if rights[index] != NO_NODE:
+        stack.append(rights[index])
+      if lefts[index] != NO_NODE:
+        stack.append(lefts[index])
+
+  def raw_bfs(self) -> Iterator[int]:
+    """Yields values in the order of BreadthFirstSearch, walking indices."""
+    values, lefts, rights = self.values, self.lefts, self.rights
+    queue = deque([0])
+    while queue:
+      index = queue.popleft()
+      if lefts[index] != NO_NODE:
+        queue.append(lefts[index])
+      if rights[index] != NO_NODE:
+        queue.append(rights[index])
+      yield values[index]
+
+  def subtree_values(self, index: int) -> Iterator[int]:
+    """Yields the values of the subtree rooted at index, parents first."""
+    values, lefts, rights = self.values, self.lefts, self.rights
+    stack = [index]
+    while stack:
+      index = stack.pop()
+      if rights[index] != NO_NODE:
+        stack.append(rights[index])
+      if lefts[index] != NO_NODE:
+        stack.append(lefts[index])
+      yield values[index]
+
+  def split(self, depth: int) -> tuple[list[int], list[int]]:
+    """Returns the indices of the nodes above depth, and of subtrees at it.
+
+    The root is at depth 0. Both lists are in level order.
+    """
+    above: list[int] = []
+    level = [0]
+    for _ in range(depth):
+      above.extend(level)
+      level = [
+          child for index in level
+          for child in (self.lefts[index], self.rights[index])
+          if child != NO_NODE
+      ]
+    return above, level
+
+  def aggregate(self,
+                reducer: Callable[[Iterable[int]], Partial],
+                combine: Callable[[Partial, Partial], Partial],
+                split_depth: int = 4,
+                workers: int | None = None) -> Partial:
+    """Reduces the tree's values across worker processes.
+
+    The tree is split into the nodes above split_depth and the subtrees
+    rooted at it. The reducer turns the values of each part into a partial
+    result, and the partials are folded with combine in level order,
+    starting with the nodes above split_depth. The parts only depend on
+    split_depth, so the result is the same for any number of workers.
+
+    The arrays are shipped to each worker once when it starts, and reducer
+    must be picklable. With a single worker, or nothing to split, the
+    subtrees are reduced in this process instead.
+    """
+    above, subtrees = self.split(split_depth)
+    partials = [reducer(self.values[index] for index in above)] if above else []
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(subtrees) < 2:
+      partials.extend(reducer(self.subtree_values(index)) for index in subtrees)
+
+    else:
+      values = self.values
+      if isinstance(values, memoryview):
+        values = array("q", values)
+      reduce_subtree = functools.partial(_reduce_subtree, reducer)
+      with ProcessPoolExecutor(min(workers, len(subtrees)),
+                               initializer=_init_worker,
+                               initargs=(values, self.lefts,
+                                         self.rights)) as executor:
+        partials.extend(executor.map(reduce_subtree, subtrees))
+
+    return functools.reduce(combine, partials)
+
+
+_worker_tree: ArrayTree | None = None
+
+
+def _init_worker(values: array[int], lefts: array[int], rights: array[int]):
+  """Stores the tree's arrays once per worker process."""
+  global _worker_tree
+  _worker_tree = ArrayTree.from_arrays(values, lefts, rights, readonly=True)
+
+
+def _reduce_subtree(reducer: Callable[[Iterable[int]], Partial],
+                    index: int) -> Partial:
+  """Reduces the values of a subtree of the worker's tree."""
+  assert _worker_tree is not None
+  return reducer(_worker_tree.subtree_values(index))
@@ -1,6 +1,11 @@
+import asyncio
+import random
+import threading
+
 import pytest
 
-from patterns.behavioral.chain_of_responsibility.sanitizer import JavascriptSanitizer, QuoteSanitizer, TagSanitizer
+from patterns.behavioral.chain_of_responsibility.benchmark import CorpusShape, benchmark, generate_corpus
+from patterns.behavioral.chain_of_responsibility.sanitizer import AsyncSanitizer, JavascriptSanitizer, QuoteSanitizer, ReplaceStage, Sanitizer, TagSanitizer, TranslateStage
 
 
 class TestChainOfResponsibility:
@@ -41,6 +46,339 @@ class TestChainOfResponsibility:
     sanitized_input = quote_sanitizer.sanitize(string)
     assert sanitized_input == "Insert text here &lt;script&gt;alert(&quot;Executing malicious code&quot;)&lt;/script&gt;"
 
+  @pytest.fixture
+  def corpus(self) -> list[str]:
+    rng = random.Random(0)
+    pieces = ["a", " ", "'", '"', "<", ">", "<script>", "</script>", "&", "/"]
+    return [
+        "".join(rng.choice(pieces)
+                for _ in range(rng.randint(0, 30)))
+        for _ in range(500)
+    ]
+
+  @pytest.mark.parametrize("order", [(0, 1, 2), (2, 1, 0), (1, 2, 0),
+                                     (2, 0, 1)])
+  def test_compiled_chain(self, corpus: list[str], order: tuple[int, ...]):
+    sanitizers = [QuoteSanitizer(), TagSanitizer(), JavascriptSanitizer()]
+    links = [sanitizers[i] for i in order]
+    for link, next_link in zip(links, links[1:]):
+      link.next_sanitizer(next_link)
+    compiled_chain = links[0].compile()
+    for string in corpus:
+      assert compiled_chain.sanitize(string) == links[0].sanitize(string)
+
+  def test_compiled_chain_is_fused(self, quote_sanitizer: QuoteSanitizer,
+                                   tag_sanitizer: TagSanitizer,
+                                   js_sanitizer: JavascriptSanitizer):
+    quote_sanitizer.next_sanitizer(tag_sanitizer)
+    tag_sanitizer.next_sanitizer(js_sanitizer)
+    stages = quote_sanitizer.compile().stages
+    assert len(stages) == 1 and isinstance(stages[0], TranslateStage)
+
+    stages = JavascriptSanitizer().compile().stages
+    assert [type(stage) for stage in stages] == [ReplaceStage, ReplaceStage]
+
+  @pytest.mark.parametrize("mapping", [
+      dict([("<", "&lt;"), ("&", "&amp;")]),
+      dict([("&", "&amp;"), ("<", "&lt;")]),
+      dict([("a", "b"), ("b", "a")]),
+  ])
+  def test_translate_stage(self, corpus: list[str], mapping: dict[str, str]):
+    stage = TranslateStage(mapping)
+    for string in corpus + ["abba", "a<&b"]:
+      assert stage(string) == string.translate(str.maketrans(mapping))
+      out = bytearray()
+      stage.write(memoryview(string.encode()), out)
+      assert out == stage(string).encode()
+
+  def test_compiled_custom_escape(self, quote_sanitizer: QuoteSanitizer):
+
+    class UpperSanitizer(Sanitizer):
+
+      def escape(self, text_input: str) -> str:
+        return text_input.upper()
+
+    quote_sanitizer.next_sanitizer(UpperSanitizer())
+    string = "'quoted text'"
+    compiled_chain = quote_sanitizer.compile()
+    assert compiled_chain.sanitize(string) == quote_sanitizer.sanitize(string)
+
+  def test_sanitize_override(self, quote_sanitizer: QuoteSanitizer,
+                             tag_sanitizer: TagSanitizer):
+    """Test links overriding sanitize(), as in the original API, still run."""
+
+    class AmpSanitizer(Sanitizer):
+
+      def sanitize(self, text_input: str) -> str:
+        text_input = text_input.replace("&", "&amp;")
+        return self.next.sanitize(text_input) if self.next else text_input
+
+    amp_sanitizer = AmpSanitizer()
+    quote_sanitizer.next_sanitizer(amp_sanitizer)
+    amp_sanitizer.next_sanitizer(tag_sanitizer)
+    expected = "a &amp; &amp;quot;b&amp;quot; &lt;"
+    assert quote_sanitizer.sanitize('a & "b" <') == expected
+    assert quote_sanitizer.compile().sanitize('a & "b" <') == expected
+    chunks = ['a & "', 'b" <']
+    assert "".join(quote_sanitizer.sanitize_stream(chunks)) == expected
+    out = bytearray()
+    quote_sanitizer.sanitize_into('a & "b" <'.encode(), out)
+    assert out == expected.encode()
+    assert amp_sanitizer.sanitize("a & b") == "a &amp; b"
+    assert quote_sanitizer.sanitize("a & b") == "a &amp; b"
+
+    class LoudSanitizer(QuoteSanitizer):
+
+      def sanitize(self, text_input: str) -> str:
+        return super().sanitize(text_input).upper()
+
+    loud_sanitizer = LoudSanitizer()
+    loud_sanitizer.next_sanitizer(tag_sanitizer)
+    assert loud_sanitizer.sanitize('a"<b>') == "A&QUOT;&LT;B&GT;"
+    assert loud_sanitizer.compile().sanitize('a"<b>') == "A&QUOT;&LT;B&GT;"
+
+  @pytest.mark.parametrize("forwards", [True, False])
+  def test_compiled_sanitize_override(self, corpus: list[str], forwards: bool,
+                                      quote_sanitizer: QuoteSanitizer,
+                                      tag_sanitizer: TagSanitizer):
+    """Test links overriding sanitize() see the rest of the chain's output."""
+
+    class PostSanitizer(Sanitizer):
+
+      def sanitize(self, text_input: str) -> str:
+        if forwards and self.next:
+          text_input = self.next.sanitize(text_input)
+        return text_input.upper()
+
+    post_sanitizer = PostSanitizer()
+    quote_sanitizer.next_sanitizer(post_sanitizer)
+    post_sanitizer.next_sanitizer(tag_sanitizer)
+    expected = "&LT;B&GT;" if forwards else "<B>"
+    assert post_sanitizer.sanitize("<b>") == expected
+    assert post_sanitizer.compile().sanitize("<b>") == expected
+
+    compiled_chain = quote_sanitizer.compile()
+    for string in corpus:
+      expected = quote_sanitizer.sanitize(string)
+      assert compiled_chain.sanitize(string) == expected
+      assert "".join(quote_sanitizer.sanitize_stream([string])) == expected
+      out = bytearray()
+      quote_sanitizer.sanitize_into(string.encode(), out)
+      assert out == expected.encode()
+    sanitized_corpus = quote_sanitizer.sanitize_many(corpus, workers=1)
+    assert list(sanitized_corpus) == list(map(quote_sanitizer.sanitize, corpus))
+
+  @staticmethod
+  def split(string: str, rng: random.Random) -> list[str]:
+    cuts = sorted(rng.randint(0, len(string)) for _ in range(rng.randint(0, 5)))
+    bounds = zip([0] + cuts, cuts + [len(string)])
+    return [string[start:end] for start, end in bounds]
+
+  @pytest.mark.parametrize("order", [(0, 1, 2), (2, 1, 0)])
+  def test_sanitize_stream(self, corpus: list[str], order: tuple[int, ...]):
+    sanitizers = [QuoteSanitizer(), TagSanitizer(), JavascriptSanitizer()]
+    links = [sanitizers[i] for i in order]
+    for link, next_link in zip(links, links[1:]):
+      link.next_sanitizer(next_link)
+    rng = random.Random(1)
+    for string in corpus:
+      chunks = self.split(string, rng)
+      sanitized = "".join(links[0].sanitize_stream(chunks))
+      assert sanitized == links[0].sanitize(string)
+
+  def test_sanitize_byte_stream(self, js_sanitizer: JavascriptSanitizer,
+                                tag_sanitizer: TagSanitizer):
+    js_sanitizer.next_sanitizer(tag_sanitizer)
+    data = "<scr<script>ipt>é</script>".encode()
+    chunks = [data[index:index + 1] for index in range(len(data))]
+    sanitized_chunks = list(js_sanitizer.sanitize_stream(chunks))
+    assert all(isinstance(chunk, bytes) for chunk in sanitized_chunks)
+    expected = js_sanitizer.sanitize(data.decode()).encode()
+    assert b"".join(sanitized_chunks) == expected
+
+  @pytest.mark.parametrize("workers", [1, 2])
+  def test_sanitize_many(self, corpus: list[str], workers: int,
+                         quote_sanitizer: QuoteSanitizer,
+                         tag_sanitizer: TagSanitizer,
+                         js_sanitizer: JavascriptSanitizer):
+    quote_sanitizer.next_sanitizer(tag_sanitizer)
+    tag_sanitizer.next_sanitizer(js_sanitizer)
+    sanitized_corpus = quote_sanitizer.sanitize_many(iter(corpus),
+                                                     workers=workers,
+                                                     chunksize=7)
+    expected = [quote_sanitizer.sanitize(string) for string in corpus]
+    assert list(sanitized_corpus) == expected
+
+  def test_fast_path(self, quote_sanitizer: QuoteSanitizer,
+                     tag_sanitizer: TagSanitizer):
+
+    class CountingSanitizer(TagSanitizer):
+      calls = 0
+      triggers = frozenset("<>")
+
+      def escape(self, text_input: str) -> str:
+        self.calls += 1
+        return super().escape(text_input)
+
+    counting_sanitizer = CountingSanitizer()
+    quote_sanitizer.next_sanitizer(counting_sanitizer)
+    assert quote_sanitizer.sanitize("plain text") == "plain text"
+    assert counting_sanitizer.calls == 0
+    assert quote_sanitizer.sanitize("<b>") == "&lt;b&gt;"
+    assert counting_sanitizer.calls == 1
+    assert quote_sanitizer.compile().triggers == frozenset("'\"<>")
+
+    counting_sanitizer.triggers = None
+    counting_sanitizer.next_sanitizer(tag_sanitizer)
+    assert quote_sanitizer.sanitize("plain text") == "plain text"
+    assert counting_sanitizer.calls == 2
+    assert quote_sanitizer.compile().triggers is None
+
+  def test_derived_triggers(self, quote_sanitizer: QuoteSanitizer):
+    """Test subclasses extending replacements are triggered by them."""
+
+    class AmpSanitizer(QuoteSanitizer):
+      replacements = QuoteSanitizer.replacements + (("&", "&amp;"),)
+
+    amp_sanitizer = AmpSanitizer()
+    assert amp_sanitizer.sanitize("a & b") == "a &amp; b"
+    assert amp_sanitizer.compile().sanitize("a & b") == "a &amp; b"
+
+    class StaleSanitizer(AmpSanitizer):
+      triggers = frozenset("'\"")
+
+    class ExtendedSanitizer(StaleSanitizer):
+      replacements = AmpSanitizer.replacements + (("<", "&lt;"),)
+
+    assert StaleSanitizer().trigger_chars() == frozenset("'\"")
+    assert ExtendedSanitizer().trigger_chars() == frozenset("'\"&<")
+    quote_sanitizer.next_sanitizer(ExtendedSanitizer())
+    assert quote_sanitizer.sanitize("a & b <") == "a &amp; b &lt;"
+
+  def test_cache(self, quote_sanitizer: QuoteSanitizer,
+                 tag_sanitizer: TagSanitizer):
+    assert quote_sanitizer.cache_info() is None
+    quote_sanitizer.enable_cache(maxsize=2)
+    for string in ["'a'", "'a'", "'b'", "'c'", "'a'"]:
+      assert quote_sanitizer.sanitize(string) == string.replace("'", "&quot;")
+    cache_info = quote_sanitizer.cache_info()
+    assert cache_info.hits == 1
+    assert cache_info.misses == 4
+    assert cache_info.currsize == 2
+
+    quote_sanitizer.next_sanitizer(tag_sanitizer)
+    assert quote_sanitizer.cache_info().currsize == 0
+    assert quote_sanitizer.sanitize("<'a'>") == "&lt;&quot;a&quot;&gt;"
+
+  @pytest.mark.parametrize("order", [(0, 1, 2), (2, 1, 0)])
+  @pytest.mark.parametrize("buffer_type", [bytes, bytearray, memoryview])
+  def test_sanitize_into(self, corpus: list[str], order: tuple[int, ...],
+                         buffer_type: type):
+    sanitizers = [QuoteSanitizer(), TagSanitizer(), JavascriptSanitizer()]
+    links = [sanitizers[i] for i in order]
+    for link, next_link in zip(links, links[1:]):
+      link.next_sanitizer(next_link)
+    compiled_chain = links[0].compile()
+    for string in corpus + ["é'ü'<script>", "no special characters"]:
+      out = bytearray(b"prefix")
+      written = compiled_chain.sanitize_into(buffer_type(string.encode()), out)
+      expected = links[0].sanitize(string).encode()
+      assert out == b"prefix" + expected
+      assert written == len(expected)
+
+  def test_instrumentation(self, quote_sanitizer: QuoteSanitizer,
+                           tag_sanitizer: TagSanitizer,
+                           js_sanitizer: JavascriptSanitizer):
+    quote_sanitizer.next_sanitizer(tag_sanitizer)
+    tag_sanitizer.next_sanitizer(js_sanitizer)
+    assert quote_sanitizer.stats_snapshot() == {}
+
+    quote_sanitizer.enable_instrumentation()
+    quote_sanitizer.sanitize("<b>")
+    quote_sanitizer.sanitize("'a'")
+    quote_sanitizer.sanitize("plain")
+    snapshot = quote_sanitizer.stats_snapshot()
+    assert list(snapshot) == [
+        "0:QuoteSanitizer", "1:TagSanitizer", "2:JavascriptSanitizer"
+    ]
+    assert snapshot["0:QuoteSanitizer"]["calls"] == 2
+    assert snapshot["0:QuoteSanitizer"]["modified"] == 1
+    assert snapshot["1:TagSanitizer"]["chars_in"] == 3 + 13
+    assert snapshot["1:TagSanitizer"]["chars_out"] == 9 + 13
+    assert snapshot["2:JavascriptSanitizer"]["modified"] == 0
+
+    quote_sanitizer.disable_instrumentation()
+    assert quote_sanitizer.stats_snapshot() == {}
+
+  def test_sanitize_async(self, quote_sanitizer: QuoteSanitizer,
+                          tag_sanitizer: TagSanitizer):
+    quote_sanitizer.next_sanitizer(tag_sanitizer)
+    sanitized = asyncio.run(quote_sanitizer.sanitize_async("<'a'>"))
+    assert sanitized == "&lt;&quot;a&quot;&gt;"
+
+  def test_async_offload(self):
+
+    class ThreadSanitizer(QuoteSanitizer):
+      threads: list[str] = []
+
+      def escape(self, text_input: str) -> str:
+        self.threads.append(threading.current_thread().name)
+        return super().escape(text_input)
+
+    thread_sanitizer = ThreadSanitizer()
+    async_sanitizer = AsyncSanitizer(thread_sanitizer,
+                                     offload_threshold=10,
+                                     max_concurrency=2)
+
+    async def sanitize_all() -> list[str]:
+      strings = ["'a'"] + ["'" * 20] * 5
+      return await asyncio.gather(*map(async_sanitizer.sanitize, strings))
+
+    sanitized_strings = asyncio.run(sanitize_all())
+    assert sanitized_strings == ["&quot;a&quot;"] + ["&quot;" * 20] * 5
+    main_thread = threading.main_thread().name
+    assert thread_sanitizer.threads[0] == main_thread
+    assert main_thread not in thread_sanitizer.threads[1:]
+
+  def test_async_offload_across_loops(self, quote_sanitizer: QuoteSanitizer):
+    """Test a chain head's AsyncSanitizer works from several event loops."""
+    quote_sanitizer.async_sanitizer = AsyncSanitizer(quote_sanitizer,
+                                                     offload_threshold=10,
+                                                     max_concurrency=1)
+    strings = ["'" * 20] * 3
+
+    async def sanitize_all() -> list[str]:
+      return await asyncio.gather(*map(quote_sanitizer.sanitize_async, strings))
+
+    def run():
+      results.append(asyncio.run(sanitize_all()))
+
+    results: list[list[str]] = []
+    run()
+    run()
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    assert results == [["&quot;" * 20] * 3] * 3
+
+  def test_benchmark(self):
+    shape = CorpusShape(size=64, count=20, density=0.1, script_rate=0.05)
+    corpus = generate_corpus(shape)
+    assert corpus == generate_corpus(shape)
+    assert all(len(string) == 64 for string in corpus)
+    assert any("<script>" in string for string in corpus)
+
+    results = benchmark(shape, ["classic", "compiled", "bytes"])
+    modes = [result.mode for result in results]
+    assert modes == ["classic", "compiled", "bytes"]
+    for result in results:
+      assert result.calls == 20
+      assert result.p50_microseconds <= result.p99_microseconds
+
+    [result] = benchmark(shape, ["many"])
+    assert result.calls == 20 and result.megabytes_per_second > 0
+    assert result.p50_microseconds is None and result.p99_microseconds is None
+
 
 if __name__ == "__main__":
   pytest.main([__file__])
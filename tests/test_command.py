@@ -1,6 +1,14 @@
+import asyncio
+import copy
+import json
+import random
+import sys
+
 import pytest
 
-from patterns.behavioral.command.browser_commands import BrowserController, CloseAllTabs, CloseTab, CompositeBrowserCommand, CycleTab, Key, KeyCombination, Modifier, NewTab, ReverseCycleTab, TabHistory, UndoCloseTab, WebBrowser
+from patterns.behavioral.command.benchmark import TraceShape, generate_trace, keystroke_throughput, load_trace, replay_trace
+from patterns.behavioral.command.journal import FILE_HEADER, CommandJournal, replay
+from patterns.behavioral.command.browser_commands import BrowserController, CloseAllTabs, CommandDispatcher, CloseTab, CompositeBrowserCommand, CycleTab, Key, KeyCombination, Modifier, NewTab, ReverseCycleTab, TabHistory, TabList, UndoCloseTab, WebBrowser
 
 
 class TestCommand:
@@ -94,6 +102,273 @@ class TestCommand:
     controller.send_keystrokes(KeyCombination(Key.R, Modifier.CTRLSHIFT))
     assert browser.current_tab() == "New Tab"
 
+  def test_close_active_duplicate_tab(self, browser: WebBrowser,
+                                      controller: BrowserController):
+    browser.new_tab("example.com")
+    browser.new_tab("google.com")
+    controller.send_keystrokes(KeyCombination(Key.TAB, Modifier.CTRL))
+    assert browser.active_tab_index == 0
+    controller.send_keystrokes(KeyCombination(Key.W, Modifier.CTRL))
+    assert browser.tabs == ["example.com", "google.com"]
+    assert browser.active_tab_index == 1
+
+  def test_tab_list(self):
+    rng = random.Random(0)
+    tabs = TabList()
+    expected: list[str] = []
+    for step in range(5000):
+      if expected and rng.random() < 0.45:
+        index = rng.randrange(-len(expected), len(expected))
+        assert tabs.pop(index) == expected.pop(index)
+      else:
+        tabs.append(f"tab{step}")
+        expected.append(f"tab{step}")
+      if step % 97 == 0:
+        assert tabs == expected
+        assert [tabs[index] for index in range(len(expected))] == expected
+    assert tabs == expected and len(tabs) == len(expected)
+    with pytest.raises(IndexError):
+      _ = tabs[len(expected)]
+
+  def test_tab_list_api(self):
+    browser = WebBrowser(["a.com", "b.com", "c.com"])
+    browser.tabs.pop(1)
+    assert browser.tabs + ["d.com"] == ["a.com", "c.com", "d.com"]
+    assert ["z.com"] + browser.tabs == ["z.com", "a.com", "c.com"]
+    browser.tabs.insert(1, "b.com")
+    browser.tabs[0] = "0.com"
+    browser.tabs += ["d.com"]
+    assert browser.tabs == ["0.com", "b.com", "c.com", "d.com"]
+    assert json.loads(json.dumps(list(browser.tabs))) == browser.tabs
+    assert browser.tabs != "0.combc" and TabList(["a", "b"]) != "ab"
+    assert TabList(["a", "b"]) != ("a", "b")
+
+    tabs = copy.copy(browser.tabs)
+    assert tabs.pop() == "d.com"
+    assert browser.tabs == ["0.com", "b.com", "c.com", "d.com"]
+    assert len(browser.tabs) == 4 and len(tabs) == 3
+
+    browser.tabs = ["x.com", "y.com", "z.com"]
+    assert isinstance(browser.tabs, TabList)
+    assert browser.close_tabs(0, 2) == ["y.com", "x.com"]
+    assert browser.tabs == ["z.com"]
+
+  @staticmethod
+  def close_naively(browser: WebBrowser, count: int) -> list[str]:
+    return [browser.close_current_tab() for _ in range(count)]
+
+  @pytest.mark.parametrize("active_tab_index", [0, 3, 6, -1])
+  def test_bulk_close_all(self, active_tab_index: int):
+    tabs = [f"tab{index}" for index in range(7)]
+    browser, naive_browser = WebBrowser(tabs), WebBrowser(tabs)
+    browser.active_tab_index = naive_browser.active_tab_index = active_tab_index
+    assert browser.close_all_tabs() == self.close_naively(naive_browser, 7)
+    assert browser.tabs == naive_browser.tabs == []
+    assert browser.active_tab_index == naive_browser.active_tab_index
+    assert browser.close_all_tabs() == []
+
+  @pytest.mark.parametrize("start, stop", [(0, 3), (2, 5), (4, 7), (0, 7),
+                                           (3, 3)])
+  def test_bulk_close_range(self, start: int, stop: int):
+    tabs = [f"tab{index}" for index in range(7)]
+    browser, naive_browser = WebBrowser(tabs), WebBrowser(tabs)
+    naive_browser.active_tab_index = stop - 1
+    closed_tabs = self.close_naively(naive_browser, stop - start)
+    assert browser.close_tabs(start, stop) == closed_tabs
+    assert browser.tabs == naive_browser.tabs
+    if closed_tabs:
+      assert browser.active_tab_index == naive_browser.active_tab_index
+
+  def test_bulk_open(self, browser: WebBrowser):
+    browser.open_tabs([])
+    assert browser.active_tab_index == 0
+    browser.open_tabs(f"tab{index}" for index in range(3))
+    assert browser.tabs == ["google.com", "tab0", "tab1", "tab2"]
+    assert browser.current_tab() == "tab2"
+
+  def test_bounded_tab_history(self, browser: WebBrowser):
+    history = TabHistory(capacity=3)
+    close_tab = CloseTab(browser, history)
+    browser.open_tabs(f"tab{index}" for index in range(5))
+    for _ in range(5):
+      close_tab.execute()
+    assert list(history.history) == ["tab2", "tab1", "tab0"]
+    assert all(isinstance(tab, str) for tab in history.history)
+    assert history.evictions == 2
+
+    UndoCloseTab(browser, history).execute()
+    assert browser.current_tab() == "tab0"
+    assert history.footprint == sum(map(sys.getsizeof, ["tab2", "tab1"]))
+
+  def test_byte_budget_tab_history(self):
+    history = TabHistory(max_bytes=2 * sys.getsizeof("tab0"))
+    for index in range(4):
+      history.push_tab(f"tab{index}")
+    assert list(history.history) == ["tab2", "tab3"]
+    assert history.evictions == 2
+    history.push_tab("x" * 1000)
+    assert not history.history and history.footprint == 0
+
+  @pytest.mark.parametrize("seed", range(5))
+  def test_composite_coalescing(self, seed: int):
+    rng = random.Random(seed)
+    browser, naive_browser = WebBrowser(), WebBrowser()
+    composite, naive_commands = CompositeBrowserCommand(browser), []
+    command_types = ([CycleTab] * 4 + [ReverseCycleTab] * 4 + [NewTab] * 2 +
+                     [CloseAllTabs])
+    for _ in range(200):
+      command_type = rng.choice(command_types)
+      composite.add(command_type(browser))
+      naive_commands.append(command_type(naive_browser))
+
+    assert len(composite.optimize()) < len(composite.commands)
+    composite.execute()
+    for command in naive_commands:
+      command.execute()
+    assert browser.tabs == naive_browser.tabs
+    assert browser.active_tab_index == naive_browser.active_tab_index
+
+  def test_hashable_key_combination(self, controller: BrowserController):
+    key_combination = KeyCombination(Key.T, Modifier.CTRL)
+    assert key_combination == KeyCombination(Key.T, Modifier.CTRL)
+    assert hash(key_combination) == hash(KeyCombination(Key.T, Modifier.CTRL))
+    assert key_combination != KeyCombination(Key.T, Modifier.ALT)
+    interned = KeyCombination.of(Key.T, Modifier.CTRL)
+    assert interned is KeyCombination.of(Key.T, Modifier.CTRL)
+    assert KeyCombination.of(Key.T, Modifier.CTRL) in controller.commands
+    with pytest.raises(AttributeError):
+      key_combination.key = Key.W    # type: ignore
+
+  def test_keystroke_benchmark(self):
+    throughput = keystroke_throughput(count=300)
+    assert set(throughput) == {"before", "after"}
+    assert all(keystrokes > 0 for keystrokes in throughput.values())
+
+  def test_command_dispatcher(self, browser: WebBrowser,
+                              controller: BrowserController):
+    new_tab = KeyCombination(Key.T, Modifier.CTRL)
+    close_tab = KeyCombination(Key.W, Modifier.CTRL)
+
+    async def dispatch() -> tuple[list[str | None], dict[str, float]]:
+      async with CommandDispatcher(controller, maxsize=2) as dispatcher:
+
+        async def produce(key_combination: KeyCombination):
+          return [
+              await dispatcher.send_keystrokes(key_combination)
+              for _ in range(10)
+          ]
+
+        producers = [
+            produce(new_tab),
+            produce(close_tab),
+            produce(KeyCombination(Key.R)),
+        ]
+        futures = sum(await asyncio.gather(*producers), [])
+        results = await asyncio.gather(*futures)
+        return results, dispatcher.metrics()
+
+    results, metrics = asyncio.run(dispatch())
+    assert results == [None] * 20 + ["R"] * 10
+    assert browser.tabs == ["google.com"]
+    assert metrics["submitted"] == metrics["completed"] == 30
+    assert metrics["depth"] == 0 and metrics["max_depth"] <= 2
+
+  def test_command_dispatcher_error(self, controller: BrowserController):
+
+    async def dispatch():
+      async with CommandDispatcher(controller) as dispatcher:
+        close_tab = KeyCombination(Key.W, Modifier.CTRL)
+        for _ in range(2):
+          future = await dispatcher.send_keystrokes(close_tab)
+        return await future
+
+    with pytest.raises(IndexError):
+      asyncio.run(dispatch())
+
+  @pytest.mark.parametrize("checkpoint_every", [1, 7, 1000])
+  def test_journal_replay(self, tmp_path, checkpoint_every: int):
+    path = str(tmp_path / "session.journal")
+    browser = WebBrowser()
+    history = TabHistory()
+    rng = random.Random(checkpoint_every)
+    with CommandJournal(path, browser,
+                        checkpoint_every=checkpoint_every) as journal:
+      reset_browser = CompositeBrowserCommand(
+          browser,
+          [CloseAllTabs(browser), NewTab(browser)])
+      commands = [
+          journal.journaled(command) for command in [
+              NewTab(browser),
+              CycleTab(browser),
+              ReverseCycleTab(browser),
+              CloseTab(browser, history),
+              UndoCloseTab(browser, history),
+              CloseAllTabs(browser), reset_browser
+          ]
+      ]
+      for _ in range(300):
+        try:
+          rng.choice(commands).execute()
+        except IndexError:
+          pass
+
+    recovered_browser = replay(path)
+    assert recovered_browser.tabs == browser.tabs
+    assert recovered_browser.active_tab_index == browser.active_tab_index
+
+  def test_journal_torn_tail(self, tmp_path, browser: WebBrowser):
+    path = str(tmp_path / "session.journal")
+    with CommandJournal(path, browser) as journal:
+      journal.journaled(NewTab(browser)).execute()
+    with open(path, "ab") as file:
+      file.write(b"\x01\xff")
+
+    assert replay(path).tabs == ["google.com", "New Tab"]
+    with CommandJournal(path, browser) as journal:
+      journal.journaled(CycleTab(browser)).execute()
+    assert replay(path).current_tab() == browser.current_tab() == "google.com"
+
+  def test_journal_replay_skips_old_records(self, tmp_path,
+                                            browser: WebBrowser):
+    path = str(tmp_path / "session.journal")
+    with CommandJournal(path, browser, checkpoint_every=10) as journal:
+      new_tab = journal.journaled(NewTab(browser))
+      for _ in range(25):
+        new_tab.execute()
+
+    with open(path, "r+b") as file:
+      file.seek(FILE_HEADER.size)
+      file.write(b"\xff" * 64)    # Records before the last checkpoint.
+
+    assert replay(path).tabs == browser.tabs
+
+  def test_journal_keeps_other_files(self, tmp_path, browser: WebBrowser):
+    path = tmp_path / "notes.txt"
+    path.write_text("Not a journal.\n" * 10)
+    with pytest.raises(ValueError):
+      CommandJournal(str(path), browser)
+    assert path.read_text() == "Not a journal.\n" * 10
+
+    path.write_bytes(b"")
+    with CommandJournal(str(path), browser):
+      pass
+    assert replay(str(path)).tabs == browser.tabs
+
+  def test_trace_benchmark(self, tmp_path):
+    shape = TraceShape(length=500, tabs=50, close_rate=0.6)
+    trace = generate_trace(shape)
+    assert trace == generate_trace(shape)
+    path = tmp_path / "trace.txt"
+    path.write_text("\n".join(trace))
+    assert load_trace(str(path)) == trace
+
+    result = replay_trace(trace, initial_tabs=50, history_capacity=10)
+    assert result.keystrokes == 500
+    assert result.closed_tabs <= 10
+    assert result.p50_microseconds <= result.p99_microseconds
+    assert result.p99_microseconds <= result.max_microseconds
+    assert result.peak_memory_bytes > 0
+
 
 if __name__ == "__main__":
   pytest.main([__file__, "-v"])
@@ -1,5 +1,11 @@
+from collections import Counter
+import functools
+import operator
+import random
+import tracemalloc
+
 import pytest
-from patterns.behavioral.iterator.tree_traversal import Tree
+from patterns.behavioral.iterator.tree_traversal import ArrayTree, AVLNode, Tree, TreeNode
 
 
 class TestIterator:
@@ -38,6 +44,346 @@ class TestIterator:
     bfs_traversal = [node.value for node in unbalanced_tree.bfs()]
     assert bfs_traversal == [num for num in range(1, 16)]
 
+  def test_lazy_iterators(self, tree: Tree, capsys: pytest.CaptureFixture[str]):
+    """Test iterators yield nodes before walking the whole tree."""
+    dfs, bfs = tree.preorder_dfs(), tree.bfs()
+    assert next(dfs).value == 1
+    assert next(bfs).value == 8
+    tree.add_node(16)
+    assert [node.value for node in dfs][-6:] == [13, 16, 15, 14, 12, 8]
+    assert [node.value for node in bfs][-1] == 16
+    assert capsys.readouterr().out == ""
+
+  @staticmethod
+  def build_degenerate_tree(size: int) -> Tree:
+    tree = Tree(0)
+    node = tree.root
+    for num in range(1, size):
+      node.right = TreeNode(num)
+      node = node.right
+    return tree
+
+  @pytest.fixture
+  def degenerate_tree(self) -> Tree:
+    """A tree as deep as it is large, as sorted inserts produce."""
+    return self.build_degenerate_tree(200_000)
+
+  def test_degenerate_tree(self, degenerate_tree: Tree):
+    """Test traversals of very deep trees do not recurse."""
+    dfs_traversal = [node.value for node in degenerate_tree.preorder_dfs()]
+    assert dfs_traversal == list(range(199_999, -1, -1))
+    bfs_traversal = [node.value for node in degenerate_tree.bfs()]
+    assert bfs_traversal == list(range(200_000))
+    assert degenerate_tree.root == self.build_degenerate_tree(200_000).root
+    assert repr(degenerate_tree.root) == (
+        "TreeNode(value=0, left=None, right=TreeNode(value=1, ...))")
+
+  def test_node_equality(self, tree: Tree, unbalanced_tree: Tree):
+    """Test nodes compare equal by value and structure."""
+    other_tree = Tree(8)
+    for num in [4, 12, 2, 6, 10, 14, 1, 3, 5, 7, 9, 11, 13, 15]:
+      other_tree.add_node(num)
+    assert tree.root == other_tree.root
+    assert tree.root != unbalanced_tree.root
+    other_tree.add_node(16)
+    assert tree.root != other_tree.root
+
+  @staticmethod
+  def assert_avl(tree: Tree) -> list[int]:
+    """Asserts every node is height balanced and returns the in-order values."""
+    heights: dict[int, int] = {}
+    for node in tree.preorder_dfs():
+      left, right = (heights[id(child)] if child else 0
+                     for child in (node.left, node.right))
+      assert abs(left - right) <= 1
+      heights[id(node)] = 1 + max(left, right)
+      assert node.height == heights[id(node)]
+
+    values, stack, node = [], [], tree.root
+    while stack or node:
+      while node:
+        stack.append(node)
+        node = node.left
+      node = stack.pop()
+      values.append(node.value)
+      node = node.right
+    return values
+
+  @pytest.mark.parametrize("values", [
+      list(range(1, 2000)),
+      list(range(2000, 0, -1)),
+      [num % 7 for num in range(1, 2000)],
+  ])
+  def test_balanced_tree(self, values: list[int]):
+    """Test balanced trees stay AVL balanced with values in order."""
+    tree = Tree(0, balanced=True)
+    for num in values:
+      tree.add_node(num)
+    assert self.assert_avl(tree) == sorted([0] + values)
+    assert tree.root.height <= 16
+    assert all(isinstance(node, AVLNode) for node in tree.bfs())
+    assert sorted(node.value for node in tree.bfs()) == sorted([0] + values)
+
+  @pytest.mark.parametrize("values", [
+      [8, 4, 12, 2, 6, 10, 14, 1, 3, 5, 7, 9, 11, 13, 15],
+      list(range(10_000, 0, -1)),
+      [num % 5 for num in range(1000)],
+      [3],
+  ])
+  def test_from_values(self, values: list[int]):
+    """Test bulk loaded trees are balanced with equal values to the right."""
+    tree = Tree.from_values(values)
+    assert sorted(node.value for node in tree.bfs()) == sorted(values)
+    for node in tree.bfs():
+      if node.left:
+        left_subtree = node_tree(node.left)
+        assert all(child.value < node.value for child in left_subtree.bfs())
+      if node.right:
+        right_subtree = node_tree(node.right)
+        assert all(child.value >= node.value for child in right_subtree.bfs())
+    if len(set(values)) == len(values):
+      assert max(depths(tree)) == len(values).bit_length()
+
+    tree.add_node(0)
+    assert sorted(node.value for node in tree.bfs()) == sorted(values + [0])
+    assert not any(hasattr(node, "height") for node in tree.bfs())
+
+  def test_from_values_balanced(self):
+    """Test balanced bulk loaded trees are valid AVL trees."""
+    values = [num % 5 for num in range(1000)]
+    tree = Tree.from_values(values, balanced=True)
+    for num in range(100):
+      tree.add_node(num)
+    assert self.assert_avl(tree) == sorted(values + list(range(100)))
+
+  def test_from_values_duplicates(self):
+    """Test heavy duplicates trade balance for equal values to the right."""
+    values = [7] * 1000 + [3, 9]
+    tree = Tree.from_values(values)
+    assert [node.value for node in tree.inorder_dfs()] == sorted(values)
+    assert max(depths(Tree.from_values([7] * 1000))) == 1000
+
+    balanced_tree = Tree.from_values(values, balanced=True)
+    assert self.assert_avl(balanced_tree) == sorted(values)
+    assert max(depths(balanced_tree)) == len(values).bit_length()
+
+  def test_from_no_values(self):
+    with pytest.raises(ValueError):
+      Tree.from_values([])
+
+  def test_array_tree(self, tree: Tree, unbalanced_tree: Tree):
+    """Test array backed trees iterate like the trees they copy."""
+    for source_tree in (tree, unbalanced_tree):
+      array_tree = ArrayTree.from_tree(source_tree)
+      dfs_traversal = [node.value for node in source_tree.preorder_dfs()]
+      bfs_traversal = [node.value for node in source_tree.bfs()]
+      assert [node.value for node in array_tree.preorder_dfs()] == dfs_traversal
+      assert list(array_tree.preorder_dfs(raw=True)) == dfs_traversal
+      assert [node.value for node in array_tree.bfs()] == bfs_traversal
+      assert list(array_tree.bfs(raw=True)) == bfs_traversal
+
+  def test_array_tree_add_node(self):
+    """Test array backed trees insert like trees."""
+    values = random.Random(0).choices(range(100), k=1000)
+    tree, array_tree = Tree(50), ArrayTree(50)
+    for num in values:
+      tree.add_node(num)
+      array_tree.add_node(num)
+    assert len(array_tree) == 1001
+    dfs_traversal = [node.value for node in tree.preorder_dfs()]
+    assert list(array_tree.preorder_dfs(raw=True)) == dfs_traversal
+    assert list(array_tree.bfs(raw=True)) == [node.value for node in tree.bfs()]
+
+  def test_array_tree_memory(self):
+    """Test array backed trees take a fraction of the memory."""
+    values = list(range(20_000))
+
+    def allocated(build) -> int:
+      tracemalloc.start()
+      built = build()
+      size, _ = tracemalloc.get_traced_memory()
+      tracemalloc.stop()
+      del built
+      return size
+
+    tree_size = allocated(lambda: Tree.from_values(values))
+    array_tree_size = allocated(
+        lambda: ArrayTree.from_tree(Tree.from_values(values)))
+    assert array_tree_size * 4 < tree_size
+
+  def test_inorder_dfs(self, tree: Tree, unbalanced_tree: Tree):
+    """Test In-order Depth First Search Traversal."""
+    assert [node.value for node in tree.inorder_dfs()] == list(range(1, 16))
+    reverse_traversal = [node.value for node in tree.inorder_dfs(reverse=True)]
+    assert reverse_traversal == list(range(15, 0, -1))
+    unbalanced_traversal = [
+        node.value for node in unbalanced_tree.inorder_dfs()
+    ]
+    assert unbalanced_traversal == list(range(1, 16))
+
+  @pytest.mark.parametrize("balanced", [False, True])
+  def test_range_search(self, balanced: bool):
+    """Test range queries match filtering every value."""
+    rng = random.Random(0)
+    values = [rng.randrange(500) for _ in range(2000)]
+    tree = Tree(250, balanced)
+    for num in values:
+      tree.add_node(num)
+    values = sorted(values + [250])
+
+    bounds = [(100, 200), (None, 50), (450, None), (None, None), (250, 251),
+              (300, 300)]
+    for low, high in bounds:
+      expected = [
+          num for num in values
+          if (low is None or num >= low) and (high is None or num < high)
+      ]
+      search = tree.range_search(low, high)
+      assert [node.value for node in search] == expected
+      search = tree.range_search(low, high, reverse=True)
+      assert [node.value for node in search] == expected[::-1]
+      assert tree.count_in_range(low, high) == len(expected)
+
+  def test_range_search_prunes(self):
+    """Test range queries only visit the path to the range."""
+    tree = Tree.from_values(range(1 << 16))
+    visited = []
+    search = tree.range_search(1000, 1010)
+    original_lower = search.lower
+
+    def lower(node: TreeNode) -> TreeNode | None:
+      visited.append(node)
+      return original_lower(node)
+
+    search.lower = lower    # type: ignore
+    search.nodes = search.traverse(tree.root)
+    assert [node.value for node in search] == list(range(1000, 1010))
+    assert len(visited) < 3 * 16 + 10
+
+  def test_traversal_cache(self, tree: Tree):
+    """Test iterators share one traversal until the tree changes."""
+    first, second = tree.bfs(), tree.bfs()
+    assert next(first) is next(second)
+    assert [node.value for node in first] == [node.value for node in second]
+    cached_nodes = tree.traversals["bfs"].nodes
+    assert list(tree.bfs()) == cached_nodes
+    assert tree.traversals["bfs"].nodes is cached_nodes
+    assert tree.cache_nbytes > 0
+
+    version = tree.version
+    tree.add_node(16)
+    assert tree.version == version + 1
+    assert [node.value for node in tree.bfs()][-1] == 16
+    assert [node.value for node in tree.inorder_dfs()] == list(range(1, 17))
+    reverse_traversal = [node.value for node in tree.inorder_dfs(reverse=True)]
+    assert reverse_traversal == list(range(16, 0, -1))
+
+    tree.clear_traversal_cache()
+    assert tree.cache_nbytes == 0
+
+  def test_traversal_cache_opt_out(self):
+    """Test trees without a traversal cache traverse afresh."""
+    tree = Tree(8, cache_traversals=False)
+    for num in [4, 12]:
+      tree.add_node(num)
+    assert [node.value for node in tree.preorder_dfs()] == [4, 12, 8]
+    assert [node.value for node in tree.preorder_dfs()] == [4, 12, 8]
+    assert not tree.traversals
+    assert tree.cache_nbytes == 0
+
+  @pytest.mark.parametrize("balanced", [False, True])
+  def test_save_and_load(self, balanced: bool, tmp_path):
+    """Test saved trees load with the same shape, as Trees or ArrayTrees."""
+    rng = random.Random(0)
+    tree = Tree(0, balanced)
+    for _ in range(1000):
+      tree.add_node(rng.randrange(-2**62, 2**62))
+    path = str(tmp_path / "tree.bin")
+    tree.save(path)
+
+    loaded_tree = Tree.load(path)
+    assert loaded_tree.root == tree.root
+    assert loaded_tree.balanced == balanced
+    if balanced:
+      self.assert_avl(loaded_tree)
+    else:
+      assert not any(isinstance(node, AVLNode) for node in loaded_tree.bfs())
+
+    array_tree = ArrayTree.load(path)
+    preorder = [node.value for node in tree.preorder_dfs()]
+    assert list(array_tree.preorder_dfs(raw=True)) == preorder
+    bfs = [node.value for node in tree.bfs()]
+    assert [node.value for node in array_tree.bfs()] == bfs
+    with pytest.raises(TypeError):
+      array_tree.add_node(1)
+
+    array_tree.save(path)
+    assert Tree.load(path).root == tree.root
+
+  def test_load_invalid(self, tree: Tree, tmp_path):
+    """Test loading files that are not whole saved trees fails."""
+    path = tmp_path / "tree.bin"
+    tree.save(str(path))
+    data = path.read_bytes()
+    invalid_files = [
+        b"", b"NOPE" + data[4:], data[:-1], data[:-4] + b"\xff" * 4
+    ]
+    for invalid in invalid_files:
+      path.write_bytes(invalid)
+      with pytest.raises(ValueError):
+        Tree.load(str(path))
+
+  @pytest.mark.parametrize("workers", [1, 3])
+  def test_aggregate(self, workers: int):
+    """Test aggregates match reducing every value, for any number of workers."""
+    rng = random.Random(0)
+    values = [rng.randrange(100) for _ in range(5000)]
+    tree = Tree(50)
+    for num in values:
+      tree.add_node(num)
+    values.append(50)
+
+    aggregate = functools.partial(tree.aggregate, workers=workers)
+    assert aggregate(sum, operator.add) == sum(values)
+    assert aggregate(Counter, operator.add, split_depth=2) == Counter(values)
+    assert aggregate(sum, operator.add, split_depth=0) == sum(values)
+    assert aggregate(list, operator.add) == tree.aggregate(list,
+                                                           operator.add,
+                                                           workers=1)
+
+  def test_aggregate_array_tree_cache(self, tree: Tree):
+    """Test the ArrayTree sent to workers is reused until the tree changes."""
+    array_tree = tree.array_tree()
+    assert tree.array_tree() is array_tree
+    assert tree.cache_nbytes >= array_tree.nbytes == 16 * 15
+    tree.add_node(16)
+    assert tree.array_tree() is not array_tree
+    assert tree.aggregate(sum, operator.add, workers=2) == sum(range(1, 17))
+
+  def test_aggregate_loaded_tree(self, tree: Tree, tmp_path):
+    """Test aggregating a memory-mapped tree."""
+    path = str(tmp_path / "tree.bin")
+    tree.save(path)
+    array_tree = ArrayTree.load(path)
+    assert array_tree.aggregate(max, max, split_depth=2, workers=2) == 15
+
+
+def node_tree(node: TreeNode) -> Tree:
+  """Returns a tree rooted at node."""
+  tree = Tree()
+  tree.root = node
+  return tree
+
+
+def depths(tree: Tree) -> list[int]:
+  """Returns the depth of every node, counting the root as 1."""
+  depth = {id(tree.root): 1}
+  for node in tree.bfs():
+    for child in (node.left, node.right):
+      if child:
+        depth[id(child)] = depth[id(node)] + 1
+  return list(depth.values())
+
 
 if __name__ == "__main__":
   pytest.main([__file__])